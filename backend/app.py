@@ -1,18 +1,38 @@
-import pandas as pd
 import json
-import difflib
+import math
 import os
-import unicodedata
-import requests
-import xml.etree.ElementTree as ET
-import concurrent.futures
+import queue
+import time
 import jwt
 import datetime
 from functools import wraps
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
-from dataclasses import dataclass, asdict
-from collections import defaultdict
+
+from candidate_store import CandidateStore
+from district_results import (URL_METADATA_JSON, DistrictResultsCache, DistrictUnavailable,
+                              ResultsParseError)
+from http_cache import CachedResource
+from http_client import HttpClient
+from montecarlo import run_montecarlo
+from process_pool import get_process_pool, pool_workers
+from coalitions import search_coalitions
+from sensitivity import national_sensitivity
+from poll_matching import PollMatchIndex
+from result_cache import ResultCache
+from json_responses import JsonResponseCache
+from scenarios import parse_alliances, scenario_overlay
+from results_poller import ResultsPoller
+from national_aggregate import NationalAggregate
+from models import DistrictBuilder, DistrictData
+from results_stream import ResultBroadcaster
+from snapshot_archive import ArchiveClient, SnapshotArchive
+from history_store import ResultsHistory, changes, merge_totals, parse_time
+from metadata_index import MetadataIndexCache
+from phenomena import ARRASTRADOS, CORTADOS, PhenomenaIndex
+from parity import GENDERS, DistrictParity, parity_correction, parity_report
+from instrumentation import (REQUESTS, SPANS, ProfileLog, configure as configure_metrics,
+                             observe_request, render_gauges, span)
 
 app = Flask(__name__)
 CORS(app)
@@ -20,17 +40,49 @@ app.config['SECRET_KEY'] = 'tu_clave_secreta_super_segura_2025'
 
 
 CSV_FILE = "https://www.emol.com/especiales/2025/nacional/elecciones/data/dip.csv"
+CSV_LOCAL_FILE = 'dip.csv'
 DB_FILE = 'db.json'
 POLL_API_URL = "https://dhondt.azurewebsites.net/api/encuestas"
+POLL_LOCAL_FILE = 'encuestas.json'
 
 
 IMG_BASE_URL = "https://static.emol.cl/emol50/especiales/img/2025/elecciones/dip/"
-URL_METADATA_JSON = "https://static.emol.cl/emol50/especiales/js/2025/elecciones/dbres.json"
+# Segundos que se reutiliza dbres.json antes de revalidarlo contra emol
+METADATA_TTL = int(os.environ.get('METADATA_TTL', 60))
+# Segundos que se reutiliza cada XML de distrito antes de revalidarlo
+XML_TTL = int(os.environ.get('XML_TTL', 15))
+# Cada cuántos segundos el poller revisa si cambiaron los resultados
+RESULTS_POLL_INTERVAL = int(os.environ.get('RESULTS_POLL_INTERVAL', 15))
+# Tope de requests simultáneos hacia fuentes externas y requests/s por host
+HTTP_MAX_CONCURRENCY = int(os.environ.get('HTTP_MAX_CONCURRENCY', 8))
+EMOL_RATE_LIMIT = float(os.environ.get('EMOL_RATE_LIMIT', 20))
+# Memoria máxima (MB) para resultados de escenarios ya calculados
+RESULT_CACHE_MB = int(os.environ.get('RESULT_CACHE_MB', 64))
+# Memoria máxima (MB) para respuestas JSON ya serializadas y comprimidas
+RESPONSE_CACHE_MB = int(os.environ.get('RESPONSE_CACHE_MB', 32))
+# Segundos entre comentarios keep-alive de /stream/resultados
+STREAM_HEARTBEAT = int(os.environ.get('STREAM_HEARTBEAT', 20))
+# Snapshot sqlite de las fuentes de emol (ver snapshot_archive.py). Con
+# SNAPSHOT_MODE=replay la API se sirve solo desde el archivo, sin red; con
+# SNAPSHOT_MODE=respaldo el archivo responde cuando emol falla.
+SNAPSHOT_FILE = os.environ.get('SNAPSHOT_FILE')
+SNAPSHOT_MODE = os.environ.get('SNAPSHOT_MODE', 'replay')
+# Historial sqlite de cada conteo de distrito ingerido ('' lo desactiva)
+HISTORY_FILE = os.environ.get('HISTORY_FILE', 'historial.sqlite')
+# Tiempos por tramo y por ruta para /metrics (METRICS_ENABLED=0 los desactiva;
+# ?profile=1 con token sigue funcionando)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
 
 INCENTIVE_PER_WOMAN = 500
 
 MAIN_PACTS_IDS = ['C', 'B', 'I', 'J', 'K']
 
+MC_MAX_DRAWS = 100000
+# Bajo este total (simulaciones x distritos) no conviene usar el pool de procesos
+MC_POOL_THRESHOLD = 20000
+# Desde cuántos pactos la búsqueda de coaliciones se reparte en el pool
+COALITION_POOL_MIN_PACTS = 7
+
 
 PACTO_ORDER = ['C', 'B', 'X', 'Y', 'A', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K']
 
@@ -40,35 +92,6 @@ USERS_DB = {
 }
 
 
-@dataclass
-class Candidate:
-    _id: str
-    name: str
-    party_id: str
-    votes: float = 0.0
-    gender: str = "N/A"
-    percentage: float = 0.0
-    photo_url: str = ""
-    display_party: str = ""
-    pact_id: str = ""
-    distrito_num: str = ""
-
-
-@dataclass
-class Party:
-    _id: str
-    name: str
-    list_id: str
-    votes: float = 0.0
-
-
-@dataclass
-class Pact:
-    _id: str
-    name: str
-    votes: float = 0.0
-
-
 DB_ZONAS, PACTO_NOMBRES_LOCAL, PARTIDO_NOMBRES_LOCAL = {}, {}, {}
 try:
     if os.path.exists(DB_FILE):
@@ -80,83 +103,68 @@ try:
 except:
     pass
 
-POLL_DATA_ALL = {}
-try:
-    r = requests.get(POLL_API_URL, timeout=3)
-    if r.status_code == 200:
-        POLL_DATA_ALL = r.json()
-except:
-    pass
-
-
-def normalize_string_aggressive(s):
-    if not isinstance(s, str):
-        return ""
-    s = ''.join(c for c in unicodedata.normalize(
-        'NFD', s) if unicodedata.category(c) != 'Mn')
-    return s.lower().strip()
-
-SCENARIOS = {
-    "derecha_unida": {
-        "new_id": "SC_DER",
-        "new_name": "Gran Pacto Derecha",
-        "merge_ids": ["J", "K"],
-        "color_ref": "K"
-    },
-    "izquierda_unida": {
-        "new_id": "SC_IZQ",
-        "new_name": "Gran Pacto Izquierda",
-       
-       
-        "merge_ids": ["A", "B", "C", "D", "F", "G", "H"],
-        "color_ref": "C" 
-    }
-}
-
-
-def apply_scenario_logic(data, scenario_key):
-    """
-    Recibe la data cruda de un distrito y fusiona pactos según el escenario.
-    Retorna la data modificada lista para el cálculo D'Hondt.
-    """
-    if not scenario_key or scenario_key not in SCENARIOS:
-        return data
-
-    sc = SCENARIOS[scenario_key]
-    target_ids = set(sc['merge_ids'])
-    new_pact_id = sc['new_id']
-
-    # 1. Crear el "Super Pacto" acumulador
-    super_pact = Pact(new_pact_id, sc['new_name'], 0.0)
-
-    clean_pacts = []
-
-    # 2. Sumar votos de los pactos a fusionar
-    for p in data['pacts']:
-        if p['_id'] in target_ids:
-            super_pact.votes += p['votes']
-        else:
-            clean_pacts.append(p)  # Los que no se fusionan pasan igual
-
-    # Solo agregamos el super pacto si tiene votos
-    if super_pact.votes > 0:
-        clean_pacts.append(asdict(super_pact))
-
-    # 3. Mover Partidos al nuevo Pacto (Vital para D'Hondt)
-    for party in data['parties']:
-        if party['list_id'] in target_ids:
-            party['list_id'] = new_pact_id
+HTTP_CLIENT = HttpClient(
+    max_concurrency=HTTP_MAX_CONCURRENCY,
+    host_rate={'www.emol.com': EMOL_RATE_LIMIT, 'static.emol.cl': EMOL_RATE_LIMIT},
+    headers={'User-Agent': 'Mozilla/5.0'})
+
+# Cliente para las fuentes de resultados: emol, o el snapshot local
+UPSTREAM_CLIENT = HTTP_CLIENT
+if SNAPSHOT_FILE:
+    UPSTREAM_CLIENT = ArchiveClient(
+        SnapshotArchive(SNAPSHOT_FILE),
+        upstream=HTTP_CLIENT if SNAPSHOT_MODE == 'respaldo' else None)
+
+METADATA_CACHE = CachedResource(
+    URL_METADATA_JSON, lambda r: r.json(), ttl=METADATA_TTL,
+    headers={'User-Agent': 'Mozilla/5.0'}, client=UPSTREAM_CLIENT, name='dbres')
+XML_CACHE = DistrictResultsCache(ttl=XML_TTL, client=UPSTREAM_CLIENT)
+RESULTS_HISTORY = ResultsHistory(HISTORY_FILE) if HISTORY_FILE else None
+if RESULTS_HISTORY:
+    def record_history(d_id, value):
+        distrito = int(d_id[2:])
+        with span('historial', distrito=distrito):
+            RESULTS_HISTORY.record(distrito, *value)
+    XML_CACHE.add_listener(record_history)
+# Plantillas de distrito desde dbres.json; se rearman solo con una versión nueva
+METADATA_INDEX = MetadataIndexCache(IMG_BASE_URL)
+RESULT_CACHE = ResultCache(max_bytes=RESULT_CACHE_MB * 1024 * 1024)
+RESPONSE_CACHE = JsonResponseCache(max_bytes=RESPONSE_CACHE_MB * 1024 * 1024)
+
+# Candidatos de la simulación: se parsea el CSV una sola vez
+CANDIDATE_STORE = CandidateStore([CSV_LOCAL_FILE, CSV_FILE])
+CANDIDATE_STORE.load()
+
+def load_poll_data():
+    """Encuesta desde la API; si no responde, la copia local encuestas.json."""
+    try:
+        r = UPSTREAM_CLIENT.get(POLL_API_URL, timeout=3)
+        if r.status_code == 200:
+            return r.json()
+    except:
+        pass
+    try:
+        with open(POLL_LOCAL_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except:
+        return {}
 
-    # 4. Mover Candidatos al nuevo Pacto
-    for cand in data['candidates']:
-        if cand['pact_id'] in target_ids:
-            cand['pact_id'] = new_pact_id
 
-    # Actualizamos la estructura de datos
-    data['pacts'] = clean_pacts
-    return data
+POLL_DATA_ALL = load_poll_data()
+# Índice de cruce nombre -> encuesta; se reconstruye solo si cambia la encuesta
+POLL_INDEX = PollMatchIndex(POLL_DATA_ALL)
 
 
+def refresh_poll_data():
+    global POLL_DATA_ALL, POLL_INDEX
+    data = load_poll_data()
+    if not data:
+        return False
+    index = PollMatchIndex(data)
+    if index.fingerprint == POLL_INDEX.fingerprint:
+        return False
+    POLL_DATA_ALL, POLL_INDEX = data, index
+    return True
 
 @app.route('/login', methods=['POST'])
 def login():
@@ -181,354 +189,377 @@ def login():
     return jsonify({'error': 'Usuario o contraseña incorrectos'}), 401
 
 
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = None
+def token_error():
+    """None si el request trae un token válido; si no, la respuesta 401."""
+    token = None
 
-       
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            if "Bearer " in auth_header:
-                token = auth_header.split(" ")[1]
+   
+    if 'Authorization' in request.headers:
+        auth_header = request.headers['Authorization']
+        if "Bearer " in auth_header:
+            token = auth_header.split(" ")[1]
 
-        if not token:
-            return jsonify({'message': 'Token de acceso faltante'}), 401
+    if not token:
+        return jsonify({'message': 'Token de acceso faltante'}), 401
 
-        try:
-            
-            jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': 'El token ha expirado'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': 'Token inválido'}), 401
+    try:
+        
+        jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+    except jwt.ExpiredSignatureError:
+        return jsonify({'message': 'El token ha expirado'}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({'message': 'Token inválido'}), 401
+    return None
 
+
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        error = token_error()
+        if error is not None:
+            return error
         return f(*args, **kwargs)
     return decorated
 
 
+configure_metrics(METRICS_ENABLED)
+PROFILES = ProfileLog()
 
-def calculate_dhondt(candidates_list, parties_list, pacts_list, num_seats):
-   
-    pact_votes = {p['_id']: p['votes'] for p in pacts_list}
-    party_votes = {p['_id']: p['votes'] for p in parties_list}
-    party_to_pact = {p['_id']: p['list_id'] for p in parties_list}
-
-    party_candidates = defaultdict(list)
-    for c in candidates_list:
-        party_candidates[c['party_id']].append(c)
 
-    for pid in party_candidates:
-        party_candidates[pid].sort(key=lambda x: x['votes'], reverse=True)
+@app.before_request
+def start_request_metrics():
+    if METRICS_ENABLED:
+        g.request_start = time.perf_counter()
+    # Perfil por request solo para usuarios autenticados
+    if request.args.get('profile') == '1' and token_error() is None:
+        g.profile = PROFILES.start(request.path)
 
-    
-    quotients_pacts = []
-    for pid, votes in pact_votes.items():
-        if votes > 0:
-            for i in range(1, num_seats + 1):
-                quotients_pacts.append((votes/i, pid))
 
-    quotients_pacts.sort(key=lambda x: x[0], reverse=True)
-    winning_pacts = quotients_pacts[:num_seats]
+@app.after_request
+def finish_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+        observe_request(ruta, request.method, response.status_code, time.perf_counter() - start)
+    profile = g.pop('profile', None)
+    if profile is not None:
+        PROFILES.finish(*profile)
+        response.headers['Server-Timing'] = profile[0].server_timing()
+        response.headers['X-Profile-Id'] = str(profile[0].id)
+    return response
 
-    seats_per_pact = defaultdict(int)
-    for _, pid in winning_pacts:
-        seats_per_pact[pid] += 1
 
-   
-    elected = []
-    for pact_id, seats_won in seats_per_pact.items():
-        parties_in_pact = [pid for pid,
-                           lid in party_to_pact.items() if lid == pact_id]
-        quotients_parties = []
-        for party_id in parties_in_pact:
-            pvotes = party_votes.get(party_id, 0)
-            if pvotes > 0:
-                c_count = len(party_candidates.get(party_id, []))
-                limit = max(seats_won, c_count)
-                for i in range(1, limit + 1):
-                    quotients_parties.append((pvotes/i, party_id, i-1))
-
-        quotients_parties.sort(key=lambda x: x[0], reverse=True)
-        seats_assigned = 0
-        for _, party_id, cand_idx in quotients_parties:
-            if seats_assigned >= seats_won:
-                break
-            cands = party_candidates.get(party_id, [])
-            if cand_idx < len(cands):
-                candidate = cands[cand_idx]
-                if candidate not in elected:
-                    elected.append(candidate)
-                    seats_assigned += 1
-
-    final = [asdict(c) if not isinstance(c, dict) else c for c in elected]
-    final.sort(key=lambda x: x['votes'], reverse=True)
-    return final
+@app.teardown_request
+def drop_request_profile(exc):
+    # Si la vista falló no pasa por after_request: el perfil no debe quedar activo
+    profile = g.pop('profile', None)
+    if profile is not None:
+        PROFILES.finish(*profile)
 
 
 
-def get_real_data_emol(distrito_num, preloaded_json=None):
+def load_real_district(distrito_num, preloaded_json=None):
+    """
+    DistrictData real del distrito. Si su XML no se puede descargar ni
+    parsear y no hay una copia anterior buena lanza DistrictUnavailable:
+    un archivo cortado o mal formado no se cuenta como votos en cero.
+    """
     d_id = f"60{int(distrito_num):02d}"
 
-  
-    votos_map = {}
-    total_votos_xml = 0
     try:
-        url_xml = f"https://www.emol.com/nacional/especiales/2025/presidenciales/dip_{d_id}.xml"
-        r = requests.get(url_xml, headers={
-                         'User-Agent': 'Mozilla/5.0'}, timeout=4)
-        if r.status_code == 200:
-            raw = r.content.decode('utf-8-sig', errors='ignore').strip()
-            if not raw.startswith('<'):
-                raw = r.content.decode('latin-1', errors='ignore').strip()
-            root = ET.fromstring(raw)
-            for row in root.findall(".//ROW"):
-                a, v = row.find('AMBITO'), row.find('VOTOS')
-                if a is not None and v is not None:
-                    k = a.text.strip()
-                    val = int(v.text.replace('.', '')) if v.text else 0
-                    if k == 'V':
-                        total_votos_xml = val
-                    elif k.isdigit():
-                        votos_map[k] = val
-    except:
-        pass
+        votos_map, total_votos_xml = XML_CACHE.get(d_id)
+    except (ResultsParseError, OSError) as e:
+        raise DistrictUnavailable(str(int(distrito_num)), e) from e
 
-    
     try:
-        data = preloaded_json if preloaded_json else requests.get(
-            URL_METADATA_JSON, timeout=5).json()
-        pactos_ref = data.get('dbg', {})
-        dist_data = data.get('dbdp', {}).get(d_id, {})
+        data = preloaded_json if preloaded_json else METADATA_CACHE.get()
+    except:
+        return DistrictData(str(int(distrito_num)), 3)
+    with span('armado', tipo='real'):
+        return build_real_district(distrito_num, votos_map, total_votos_xml, data)
 
-        
-        real_seats = int(dist_data.get('q', 3))
-        candidatos_raw = dist_data.get('c', {})
 
-        cands, parties, pacts = [], {}, {}
-        total_calc = 0
+def build_real_district(distrito_num, votos_map, total_votos_xml, data):
+    """DistrictData real desde los votos de un XML y la metadata de dbres.json."""
+    return METADATA_INDEX.get(data).district(distrito_num, votos_map, total_votos_xml)
 
-        for c_id_raw, val in candidatos_raw.items():
-            c_id = str(c_id_raw).strip()
 
-            
-            votos = float(votos_map.get(c_id, 0))
-            total_calc += votos
+def get_real_data_emol(distrito_num, preloaded_json=None):
+    return load_real_district(distrito_num, preloaded_json).to_payload()
 
-            p_letra = val.get('g', '?')
-            p_nombre = pactos_ref.get(p_letra, f"Lista {p_letra}")
 
-            
-            if p_letra not in pacts:
-                pacts[p_letra] = Pact(p_letra, p_nombre, 0.0)
-            pacts[p_letra].votes += votos
+@app.errorhandler(DistrictUnavailable)
+def district_unavailable(e):
+    """Endpoints de un distrito real sin votos confiables: 503 con el motivo."""
+    return jsonify({"error": str(e), "distrito": e.distrito}), 503
 
-            
-            p_sigla = val.get('p', 'IND')
-            c_cupo = val.get('c')
-            sigla_math = c_cupo if c_cupo else (
-                f"IND_{c_id}" if p_sigla == "IND" else p_sigla)
-            pid = f"{p_letra}-{sigla_math}"
-
-            if pid not in parties:
-                parties[pid] = Party(pid, sigla_math.replace(
-                    f"IND_{c_id}", "IND"), p_letra, 0.0)
-            parties[pid].votes += votos
-
-            id_foto = val.get('t')
-            foto = f"{IMG_BASE_URL}{id_foto}.jpg" if id_foto else ""
-
-            cands.append(Candidate(
-                c_id, val.get('n', ''), pid, votos,
-                val.get(
-                    's', 'N/A'), 0.0, foto, p_sigla, p_letra, str(int(distrito_num))
-            ))
-
-        base = total_votos_xml if total_votos_xml > 0 else total_calc
-        for c in cands:
-            c.percentage = round((c.votes/base)*100, 2) if base > 0 else 0
 
-        
-        return {
-            "candidates": [asdict(c) for c in cands],
-            "parties": [asdict(p) for p in parties.values()],
-            "pacts": [asdict(p) for p in pacts.values()],
-            "seats": real_seats
-        }
-    except:
-        return {"candidates": [], "parties": [], "pacts": [], "seats": 3}
+def load_simulation_district(distrito_num):
+    cols = CANDIDATE_STORE.get(distrito_num)
+    if not cols:
+        return DistrictData(str(distrito_num), 5)
+
+    seats = int(DB_ZONAS.get(f"60{int(distrito_num):02d}", {}).get(
+        'q', 5)) if DB_ZONAS else 5
+    with span('armado', tipo='simulacion'):
+        poll_votes = POLL_INDEX.match_district(
+            distrito_num, cols['nombre'], CANDIDATE_STORE.version)
+        district = DistrictBuilder(str(distrito_num), seats)
+
+        rows = zip(poll_votes, cols['nombre_full'], cols['pacto'],
+                   cols['partido'], cols['sexo'], cols['id_foto'])
+        for votos, nombre_full, pid, partid, sexo, id_foto in rows:
+            photo = f"{IMG_BASE_URL}{id_foto}.jpg" if id_foto is not None else ""
+            district.add(str(nombre_full), nombre_full, pid, PACTO_NOMBRES_LOCAL.get(pid, pid),
+                         f"{pid}-{partid}", PARTIDO_NOMBRES_LOCAL.get(partid, partid), votos,
+                         sexo, photo, partid)
+
+        return district.build()
 
 
 def get_simulation_data(distrito_num):
-    try:
-        df = pd.read_csv(CSV_FILE, encoding="utf-8")
-    except:
-        df = pd.read_csv(CSV_FILE, encoding="latin-1")
-    d_code = int(f"60{int(distrito_num):02d}")
-    df = df[pd.to_numeric(df['zona'], errors='coerce') == d_code].copy()
-    if df.empty:
-        return {"candidates": [], "parties": [], "pacts": [], "seats": 5}
+    return load_simulation_district(distrito_num).to_payload()
 
-    seats = int(DB_ZONAS.get(f"60{int(distrito_num):02d}", {}).get(
-        'q', 5)) if DB_ZONAS else 5
-    poll = POLL_DATA_ALL.get(f"D{distrito_num}", [])
-    poll_map = {normalize_string_aggressive(
-        p['nombre']): p['votos'] for p in poll}
-    s_keys = list(poll_map.keys())
-    cands, parties, pacts = [], {}, {}
-    df['nombre_norm'] = df['nombre'].apply(normalize_string_aggressive)
 
-    for _, row in df.iterrows():
-        matches = difflib.get_close_matches(
-            row['nombre_norm'], s_keys, n=1, cutoff=0.8)
-        votos = float(poll_map.get(matches[0], 0.0)) if matches else 0.0
-        pid, partid = str(row['pacto']), str(row['partido'])
-        photo = f"{IMG_BASE_URL}{int(row['id_foto'])}.jpg" if pd.notna(
-            row.get('id_foto')) else ""
+@app.route("/candidatos/recargar", methods=['POST'])
+@token_required
+def route_recargar_candidatos():
+    """Vuelve a leer dip.csv (p. ej. tras actualizar el archivo local)."""
+    if not CANDIDATE_STORE.reload():
+        return jsonify({"error": "No se pudo leer el CSV de candidatos"}), 500
+    return jsonify({"fuente": CANDIDATE_STORE.source,
+                    "version": CANDIDATE_STORE.version,
+                    "candidatos": len(CANDIDATE_STORE)})
 
-        if pid not in pacts:
-            pacts[pid] = Pact(pid, PACTO_NOMBRES_LOCAL.get(pid, pid))
-        pacts[pid].votes += votos
 
-        pkey = f"{pid}-{partid}"
-        if pkey not in parties:
-            parties[pkey] = Party(
-                pkey, PARTIDO_NOMBRES_LOCAL.get(partid, partid), pid)
-        parties[pkey].votes += votos
+@app.route("/encuestas/recargar", methods=['POST'])
+@token_required
+def route_recargar_encuestas():
+    changed = refresh_poll_data()
+    return jsonify({"actualizada": changed, "huella": POLL_INDEX.fingerprint})
 
-        cands.append(Candidate(str(row['nombre_full']), row['nombre_full'], pkey, votos, row.get(
-            'sexo', 'N/A'), 0.0, photo, partid, pid, str(distrito_num)))
 
-    return {"candidates": [asdict(c) for c in cands], "parties": [asdict(p) for p in parties.values()], "pacts": [asdict(p) for p in pacts.values()], "seats": seats}
+@app.route("/encuestas/reporte")
+@token_required
+def route_reporte_encuestas():
+    """Nombres de la encuesta sin cruce, cruces aproximados y ambiguos."""
+    for i in range(1, 29):
+        cols = CANDIDATE_STORE.get(i)
+        if cols:
+            POLL_INDEX.match_district(i, cols['nombre'], CANDIDATE_STORE.version)
+    return jsonify({"huella": POLL_INDEX.fingerprint,
+                    "distritos": POLL_INDEX.report()})
 
 
 
-@app.route("/nacional")
-# @token_required
-def get_nacional_results():
-   
-    tipo = request.args.get('tipo', 'real')
-    escenario = request.args.get('escenario', '')
+def real_district_version(distrito_num):
+    """Refresca dbres.json y el XML del distrito; retorna sus versiones."""
+    d_id = f"60{int(distrito_num):02d}"
+    for fetch in (METADATA_CACHE.get, lambda: XML_CACHE.get(d_id)):
+        try:
+            fetch()
+        except:
+            pass
+    return (METADATA_CACHE.version, XML_CACHE.version(d_id))
 
-    all_elected = []
 
-    national_summary = defaultdict(
-        lambda: {'votes': 0, 'seats': 0, 'name': '', 'is_scenario': False})
+def data_version(tipo):
+    """Versión de la data de entrada para un tipo de resultado."""
+    if tipo == 'real':
+        return RESULTS_POLLER.snapshot().version
+    return (CANDIDATE_STORE.version, POLL_INDEX.fingerprint)
 
-    json_data = None
-    try:
-        json_data = requests.get(URL_METADATA_JSON, headers={
-                                 'User-Agent': 'Mozilla/5.0'}, timeout=5).json()
-    except:
-        pass
 
-    def process(i):
-        d = str(i)
-        
-        if tipo == 'real':
-            res = get_real_data_emol(d, preloaded_json=json_data)
-        else:
-            res = get_simulation_data(d)
+def scenario_district(distrito, base, overlay):
+    """
+    Aplica el overlay de escenario sobre la data base del distrito sin
+    modificarla: la vista resultante comparte candidatos y partidos con la
+    base y solo trae su propia lista de pactos fusionados.
+    """
+    with span('escenario'):
+        res = overlay.merge_pacts(base) if overlay else base
+    with span('asignacion'):
+        elected = res.elect() if res.has_candidates else ()
+    return (distrito, res, elected)
 
-       
-        if escenario:
-            res = apply_scenario_logic(res, escenario)
 
-        
-        candidates = res['candidates']
-        seats = res['seats']
-        pacts_data = res['pacts']
+def compute_districts(tipo, overlay=None):
+    """
+    (distrito, DistrictData, índices de electos) para los 28 distritos.
+    Los resultados reales
+    salen del snapshot del poller, cuya data es compartida y de solo
+    lectura. Cada distrito con escenario queda en RESULT_CACHE con la
+    versión de su data, así solo se recalculan los distritos que cambiaron.
+    """
+    if tipo == 'real':
+        snapshot = RESULTS_POLLER.snapshot()
+        if not overlay:
+            return [(d.distrito, d.data, d.elected)
+                    for d in snapshot.districts.values()]
+        bases = [(d.distrito, d.source_version, lambda d=d: d.data)
+                 for d in snapshot.districts.values()]
+    else:
+        version = data_version(tipo)
+        bases = [(str(i), version, lambda i=i: load_simulation_district(str(i)))
+                 for i in range(1, 29)]
+
+    return [RESULT_CACHE.get_or_compute(
+        ('distrito', tipo, scenario_slot(overlay), distrito), version,
+        lambda: scenario_district(distrito, load(), overlay))
+        for distrito, version, load in bases]
+
+
+def resolve_scenario(args):
+    """
+    Overlay y etiqueta del escenario pedido: `alianzas=A+B,J+K` define
+    fusiones libres (el '+' sin codificar llega como espacio y también
+    vale); `escenario=` usa uno de los SCENARIOS predefinidos. Lanza
+    ValueError si las alianzas no son válidas o el escenario no existe.
+    """
+    alianzas = args.get('alianzas', '')
+    if alianzas:
+        overlay = parse_alliances(
+            alianzas, set(PACTO_NOMBRES_LOCAL) or set(PACTO_ORDER), PACTO_NOMBRES_LOCAL)
+        return overlay, overlay.key
+    escenario = args.get('escenario', '')
+    overlay = scenario_overlay(escenario)
+    if escenario and overlay is None:
+        raise ValueError(f"Escenario desconocido: {escenario}")
+    return overlay, escenario
 
-        dist_elected = []
-        if candidates:
-            dist_elected = calculate_dhondt(
-                candidates, res['parties'], pacts_data, seats)
 
-        return dist_elected, pacts_data
+def scenario_slot(overlay):
+    """Parte de la clave de cache que identifica el escenario ('' sin escenario)."""
+    return overlay.slot if overlay else ''
+
+
+def national_aggregate(overlay=None, escenario=''):
+    return NationalAggregate(PACTO_ORDER + ["SC_IZQ", "SC_DER"], MAIN_PACTS_IDS,
+                             overlay, escenario)
+
+
+def build_national_summary(district_results, escenario='', overlay=None):
+    """Hemiciclo nacional desde (electos, pactos) de cada distrito."""
+    with span('agregado'):
+        aggregate = national_aggregate(overlay, escenario)
+        for i, (elected_list, pacts_list) in enumerate(district_results):
+            aggregate.update(str(i), elected_list, pacts_list)
+        return aggregate.summary()
 
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=14) as executor:
-        results = executor.map(process, range(1, 29))
 
-        for elected_list, pacts_list in results:
-            all_elected.extend(elected_list)
+def build_gender_payload(districts):
+    """Totales H/M nacionales y por distrito desde los snapshots de distrito."""
+    response_data = {
+        "nacional": {
+            "candidatos": {"hombres": 0, "mujeres": 0, "total": 0},
+            "electos":    {"hombres": 0, "mujeres": 0, "total": 0}
+        },
+        
+        "distritos": []
+    }
 
+    for d in districts:
+        res = d.genero
+        
+        response_data["nacional"]["candidatos"]["hombres"] += res["candidatos"]["h"]
+        response_data["nacional"]["candidatos"]["mujeres"] += res["candidatos"]["m"]
+
+        response_data["nacional"]["electos"]["hombres"] += res["electos"]["h"]
+        response_data["nacional"]["electos"]["mujeres"] += res["electos"]["m"]
+
+        
+        response_data["distritos"].append({
+            "distrito": d.distrito,
+            "electos": {
+                "hombres": res["electos"]["h"],
+                "mujeres": res["electos"]["m"],
+                "total": res["electos"]["t"]
+            },
             
-            for p in pacts_list:
-                pid = p['_id']
-                national_summary[pid]['votes'] += p['votes']
-                if not national_summary[pid]['name']:
-                    national_summary[pid]['name'] = p['name']
+            "candidatos": {
+                "hombres": res["candidatos"]["h"],
+                "mujeres": res["candidatos"]["m"],
+                "total": res["candidatos"]["t"]
+            }
+        })
 
-                
-                if pid.startswith("SC_"):
-                    national_summary[pid]['is_scenario'] = True
+    
+    response_data["nacional"]["candidatos"]["total"] = (
+        response_data["nacional"]["candidatos"]["hombres"] +
+        response_data["nacional"]["candidatos"]["mujeres"]
+    )
+    response_data["nacional"]["electos"]["total"] = (
+        response_data["nacional"]["electos"]["hombres"] +
+        response_data["nacional"]["electos"]["mujeres"]
+    )
 
    
-    for c in all_elected:
-        national_summary[c['pact_id']]['seats'] += 1
+    response_data["distritos"].sort(key=lambda x: int(x["distrito"]))
+    return response_data
 
-    TEMP_ORDER = PACTO_ORDER + ["SC_IZQ", "SC_DER"]
-    all_elected.sort(key=lambda c: TEMP_ORDER.index(
-        c['pact_id']) if c['pact_id'] in TEMP_ORDER else 99)
 
-    
-    final_summary = []
+# Hemiciclo real sin escenario: se actualiza solo con los distritos que cambian
+NATIONAL_AGGREGATE = national_aggregate()
 
-    otros_acc = {'id': 'others', 'name': 'Otros Partidos',
-                 'votes': 0, 'seats': 0, 'color_key': 'default'}
 
-    for pid, stats in national_summary.items():
-        if stats['votes'] > 0:
-            should_show = False
+def unavailable_payload(districts):
+    """
+    Distritos del snapshot sin votos confiables (XML cortado, mal formado o
+    sin descargar): no suman escaños y el hemiciclo se marca como parcial.
+    """
+    missing = [{"distrito": d.distrito, "error": d.error}
+               for d in districts if d.error is not None]
+    missing.sort(key=lambda d: int(d["distrito"]))
+    return {"parcial": bool(missing), "distritos_no_disponibles": missing}
+
+
+def build_snapshot_payloads(districts):
+    """Respuestas sin escenario que se precalculan en cada snapshot."""
+    with span('agregado'):
+        for d in districts.values():
+            if not NATIONAL_AGGREGATE.is_current(d.distrito, d):
+                NATIONAL_AGGREGATE.update(d.distrito, d.data.candidates_payload(d.elected),
+                                          d.data.pacts_payload(), source=d)
+        return {
+            "nacional": {**NATIONAL_AGGREGATE.summary(),
+                         **unavailable_payload(districts.values())},
+            "genero": build_gender_payload(districts.values())
+        }
 
-           
-            if stats['is_scenario']:
-                should_show = True
-            
-            elif pid in MAIN_PACTS_IDS:
-                if escenario and pid in SCENARIOS.get(escenario, {}).get('merge_ids', []):
-                    should_show = False
-                else:
-                    should_show = True
-
-            if should_show:
-               
-                color_key = pid
-                
-                if pid == "SC_DER":
-                    color_key = SCENARIOS['derecha_unida']['color_ref']
-                if pid == "SC_IZQ":
-                    color_key = SCENARIOS['izquierda_unida']['color_ref']
-
-                final_summary.append({
-                    "id": pid,
-                    "name": stats['name'],
-                    "votes": stats['votes'],
-                    "seats": stats['seats'],
-                    "color_key": color_key
-                })
-            elif not stats['is_scenario']:
-               
-                is_absorbed = False
-                if escenario and pid in SCENARIOS.get(escenario, {}).get('merge_ids', []):
-                    is_absorbed = True
-
-                if not is_absorbed:
-                    otros_acc['votes'] += stats['votes']
-                    otros_acc['seats'] += stats['seats']
-
-    if otros_acc['votes'] > 0:
-        final_summary.append(otros_acc)
-
-    final_summary.sort(key=lambda x: x['seats'], reverse=True)
-
-    return jsonify({
-        "total": len(all_elected),
-        "diputados": all_elected,
-        "resumen": final_summary,
-        "escenario_activo": escenario
-    })
+
+RESULTS_POLLER = ResultsPoller(
+    real_district_version, load_real_district, build_snapshot_payloads,
+    interval=RESULTS_POLL_INTERVAL, max_workers=HTTP_MAX_CONCURRENCY)
+RESULT_STREAM = ResultBroadcaster()
+RESULTS_POLLER.add_listener(RESULT_STREAM.publish)
+
+
+@app.route("/nacional")
+# @token_required
+def get_nacional_results():
+   
+    tipo = request.args.get('tipo', 'real')
+    try:
+        overlay, escenario = resolve_scenario(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    slot = scenario_slot(overlay)
+
+    if tipo == 'real' and not overlay:
+        snapshot = RESULTS_POLLER.snapshot()
+        return RESPONSE_CACHE.respond(('nacional', tipo, slot), snapshot.version,
+                                      lambda: snapshot.payloads['nacional'])
+
+    def compute():
+        results = compute_districts(tipo, overlay)
+        summary = build_national_summary(
+            [(res.candidates_payload(elected), res.pacts_payload())
+             for _, res, elected in results], escenario, overlay)
+        if tipo == 'real':
+            summary.update(unavailable_payload(RESULTS_POLLER.snapshot().districts.values()))
+        return summary
+
+    return RESPONSE_CACHE.respond(('nacional', tipo, slot), data_version(tipo), compute)
 
 
 @app.route("/candidatos")
@@ -537,9 +568,12 @@ def route_candidatos():
     t = request.args.get('tipo', 'simulacion')
     if not d:
         return jsonify({"error": "Falta distrito"}), 400
-   
-    data = get_real_data_emol(d) if t == 'real' else get_simulation_data(d)
-    return jsonify(data)
+
+    if t == 'real':
+        return RESPONSE_CACHE.respond(('candidatos', t, d), real_district_version(d),
+                                      lambda: get_real_data_emol(d))
+    return RESPONSE_CACHE.respond(('candidatos', t, d), data_version(t),
+                                  lambda: get_simulation_data(d))
 
 
 @app.route("/dhondt")
@@ -547,124 +581,307 @@ def route_dhondt():
     d = request.args.get('distrito')
     t = request.args.get('tipo', 'simulacion')
 
-    
-    data = get_real_data_emol(d) if t == 'real' else get_simulation_data(d)
-    seats = data.get('seats', 5)
+    def compute():
+        data = load_real_district(d) if t == 'real' else load_simulation_district(d)
+        seats = data.seats
 
-    if not data['candidates']:
-        return jsonify({"elected": [], "cupos_distrito": seats})
+        if not data.has_candidates:
+            return {"elected": [], "cupos_distrito": seats}
 
-    elected = calculate_dhondt(
-        data['candidates'], data['parties'], data['pacts'], seats)
-    return jsonify({"elected": elected, "cupos_distrito": seats, "fuente": t})
+        elected = data.candidates_payload(data.elect())
+        return {"elected": elected, "cupos_distrito": seats, "fuente": t}
 
+    version = real_district_version(d) if t == 'real' else data_version(t)
+    return RESPONSE_CACHE.respond(('dhondt', t, d), version, compute)
 
-@app.route("/stats/genero")
-@token_required
-def stats_genero():
+
+@app.route("/cache/stats")
+def route_cache_stats():
+    return jsonify({"metadata": {**METADATA_CACHE.info(), "indice": METADATA_INDEX.info()},
+                    "distritos": XML_CACHE.info(),
+                    "resultados": RESULT_CACHE.info(),
+                    "respuestas": RESPONSE_CACHE.info(),
+                    "stream": RESULT_STREAM.info(),
+                    "historial": RESULTS_HISTORY.info() if RESULTS_HISTORY else None})
+
+
+@app.route("/metrics")
+def route_metrics():
     """
-    Retorna totales nacionales y un desglose por distrito de 
-    Hombres/Mujeres (Candidatos y Electos).
+    Métricas en el formato de texto de Prometheus: histogramas de cada
+    tramo instrumentado (fetch a emol por recurso, parse, armado, escenario,
+    asignación, agregado, JSON y compresión) y de cada ruta, más los
+    contadores numéricos de los caches.
     """
-    
-    response_data = {
-        "nacional": {
-            "candidatos": {"hombres": 0, "mujeres": 0, "total": 0},
-            "electos":    {"hombres": 0, "mujeres": 0, "total": 0}
-        },
-        
-        "distritos": []
-    }
-
-    
-    json_data = None
+    gauges = []
+    for name, info in (("metadata", METADATA_CACHE.info()),
+                       ("resultados", RESULT_CACHE.info()),
+                       ("respuestas", RESPONSE_CACHE.info()),
+                       ("stream", RESULT_STREAM.info())):
+        gauges.extend(({"componente": name, "campo": k}, v) for k, v in info.items()
+                      if isinstance(v, (int, float)) and not isinstance(v, bool))
+    for d_id, info in XML_CACHE.info().items():
+        for k in ("version", "downloads", "not_modified", "errors", "stale"):
+            gauges.append(({"componente": "distrito", "distrito": d_id, "campo": k},
+                           info.get(k, 0)))
+
+    lines = (SPANS.render("monitor_tramo_segundos", "Duración de los tramos instrumentados") +
+             REQUESTS.render("monitor_http_segundos", "Duración de los requests por ruta") +
+             render_gauges("monitor_estado", "Contadores de caches y stream (ver /cache/stats)",
+                           gauges))
+    return Response("\n".join(lines) + "\n", mimetype='text/plain; version=0.0.4')
+
+
+@app.route("/metrics/perfiles")
+@token_required
+def route_perfiles():
+    """Últimos perfiles pedidos con ?profile=1 (o uno con `id=`)."""
+    if 'id' not in request.args:
+        return jsonify({"perfiles": PROFILES.get()})
     try:
-        json_data = requests.get(URL_METADATA_JSON, headers={
-                                 'User-Agent': 'Mozilla/5.0'}, timeout=5).json()
-    except Exception as e:
-        return jsonify({"error": "No se pudo cargar metadata externa", "details": str(e)}), 500
+        profile = PROFILES.get(int(request.args['id']))
+    except ValueError:
+        return jsonify({"error": "Parámetros inválidos"}), 400
+    if profile is None:
+        return jsonify({"error": "Perfil no encontrado"}), 404
+    return jsonify(profile)
 
-    
-    def process_gender_district(i):
-        distrito_id = str(i)
 
-       
-        res = get_real_data_emol(distrito_id, preloaded_json=json_data)
-        candidates = res['candidates']
-        seats = res['seats']
+@app.route("/stream/resultados")
+def stream_resultados():
+    """
+    Resultados en vivo por Server-Sent Events: al conectar se envía el
+    snapshot completo (o los deltas perdidos si llega Last-Event-ID) y luego
+    un evento 'delta' por cada snapshot nuevo del poller. Todos los clientes
+    reciben el mismo mensaje ya serializado.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('ultimo')
 
-        
-        c_h, c_m = 0, 0  
-        e_h, e_m = 0, 0  
+    # Suscribir antes de leer el snapshot para no perder un delta intermedio
+    sub = RESULT_STREAM.subscribe()
+    try:
+        snapshot = RESULTS_POLLER.snapshot()
+    except Exception:
+        RESULT_STREAM.unsubscribe(sub)
+        raise
 
-        
-        for c in candidates:
-            if c['gender'] == 'H':
-                c_h += 1
-            elif c['gender'] == 'M':
-                c_m += 1
+    def generate():
+        try:
+            sent = snapshot.version
+            for message in RESULT_STREAM.catch_up(last_event_id, snapshot):
+                yield message
+            while not sub.dropped:
+                try:
+                    version, message = sub.queue.get(timeout=STREAM_HEARTBEAT)
+                except queue.Empty:
+                    yield b": ping\n\n"
+                    continue
+                if version > sent:
+                    sent = version
+                    yield message
+        finally:
+            RESULT_STREAM.unsubscribe(sub)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route("/simulacion/montecarlo")
+def route_montecarlo():
+    """
+    Proyección de escaños con incertidumbre: muestrea los porcentajes de la
+    encuesta con una Dirichlet y corre D'Hondt en cada simulación.
+    """
+    try:
+        draws = int(request.args.get('simulaciones', 1000))
+        concentration = float(request.args.get('concentracion', 200))
+        seed = int(request.args.get('semilla', 0))
+    except ValueError:
+        return jsonify({"error": "Parámetros inválidos"}), 400
+
+    if (not 1 <= draws <= MC_MAX_DRAWS or not math.isfinite(concentration)
+            or concentration <= 0 or seed < 0):
+        return jsonify({"error": f"simulaciones debe estar entre 1 y {MC_MAX_DRAWS}, "
+                                 "concentracion debe ser un número positivo y "
+                                 "semilla no puede ser negativa"}), 400
+
+    districts = []
+    for i in range(1, 29):
+        data = load_simulation_district(str(i))
+        if data.has_candidates:
+            districts.append(data)
+
+    executor = None
+    if draws * len(districts) >= MC_POOL_THRESHOLD:
+        executor = get_process_pool()
+
+    result = run_montecarlo(districts, draws, concentration, seed, executor)
+    result["meta"] = {
+        "simulaciones": draws,
+        "concentracion": concentration,
+        "semilla": seed
+    }
+    return jsonify(result)
 
-       
-        elected_list = []
-        if candidates:
-            elected_list = calculate_dhondt(
-                candidates, res['parties'], res['pacts'], seats)
 
-        for e in elected_list:
-            if e['gender'] == 'H':
-                e_h += 1
-            elif e['gender'] == 'M':
-                e_m += 1
+@app.route("/simulacion/coaliciones")
+def route_coaliciones():
+    """
+    Busca las agrupaciones de `pactos` que más escaños dan al bloque de
+    `pacto`. Retorna el frente de Pareto (más escaños con menos socios) y
+    las mejores agrupaciones evaluadas.
+    """
+    tipo = request.args.get('tipo', 'simulacion')
+    known = set(PACTO_NOMBRES_LOCAL) or set(PACTO_ORDER)
+    chosen = [p.strip().upper() for p in
+              request.args.get('pactos', ','.join(MAIN_PACTS_IDS)).split(',') if p.strip()]
+    target = request.args.get('pacto', chosen[0] if chosen else '').strip().upper()
+    try:
+        limit = int(request.args.get('limite', 20))
+    except ValueError:
+        return jsonify({"error": "Parámetros inválidos"}), 400
+    if limit < 0:
+        return jsonify({"error": "Parámetros inválidos"}), 400
+
+    if target and target not in chosen:
+        chosen.insert(0, target)
+    unknown = [p for p in chosen if p not in known]
+    if not target or unknown or len(set(chosen)) != len(chosen):
+        return jsonify({"error": "Pactos inválidos: " + ", ".join(unknown or chosen)}), 400
+
+    def compute():
+        districts = [(res.seats, list(zip(res.pact_id, res.pact_votes)))
+                     for _, res, _ in compute_districts(tipo)
+                     if res.has_candidates]
+        executor = None
+        if len(chosen) >= COALITION_POOL_MIN_PACTS and pool_workers() > 1:
+            executor = get_process_pool()
+        return search_coalitions(districts, chosen, target, executor, pool_workers())
+
+    def respond():
+        result = RESULT_CACHE.get_or_compute(
+            ('coaliciones', tipo, tuple(chosen), target), version, compute)
+        return {**result, "mejores": result['mejores'][:limit], "tipo": tipo}
+
+    version = data_version(tipo)
+    return RESPONSE_CACHE.respond(
+        ('coaliciones', tipo, tuple(chosen), target, limit), version, respond)
 
-       
-        return {
-            "id": distrito_id,
-            "candidatos": {"h": c_h, "m": c_m, "t": c_h + c_m},
-            "electos":    {"h": e_h, "m": e_m, "t": e_h + e_m}
-        }
 
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=14) as executor:
-        results = executor.map(process_gender_district, range(1, 29))
+@app.route("/stats/genero")
+@token_required
+def stats_genero():
+    """
+    Retorna totales nacionales y un desglose por distrito de 
+    Hombres/Mujeres (Candidatos y Electos).
+    """
+    try:
+        METADATA_CACHE.get()
+    except Exception as e:
+        return jsonify({"error": "No se pudo cargar metadata externa", "details": str(e)}), 500
 
-        for res in results:
-            
-            response_data["nacional"]["candidatos"]["hombres"] += res["candidatos"]["h"]
-            response_data["nacional"]["candidatos"]["mujeres"] += res["candidatos"]["m"]
+    snapshot = RESULTS_POLLER.snapshot()
+    return RESPONSE_CACHE.respond(('genero',), snapshot.version,
+                                  lambda: snapshot.payloads['genero'])
 
-            response_data["nacional"]["electos"]["hombres"] += res["electos"]["h"]
-            response_data["nacional"]["electos"]["mujeres"] += res["electos"]["m"]
 
-            
-            response_data["distritos"].append({
-                "distrito": res["id"],
-                "electos": {
-                    "hombres": res["electos"]["h"],
-                    "mujeres": res["electos"]["m"],
-                    "total": res["electos"]["t"]
-                },
-                
-                "candidatos": {
-                    "hombres": res["candidatos"]["h"],
-                    "mujeres": res["candidatos"]["m"],
-                    "total": res["candidatos"]["t"]
-                }
-            })
+@app.route("/stats/paridad")
+@token_required
+def stats_paridad():
+    """
+    Paridad de género: candidatos y electos H/M del país, por pacto, por
+    partido y por distrito, con el incentivo de INCENTIVE_PER_WOMAN por
+    mujer electa. `distrito=` limita pactos y partidos a un distrito;
+    `correccion=1` agrega la asignación que resulta de aplicar la regla
+    de corrección de paridad (ver parity_correction) y sus reemplazos.
+    """
+    tipo = request.args.get('tipo', 'real')
+    try:
+        distrito = str(int(request.args['distrito'])) if 'distrito' in request.args else None
+    except ValueError:
+        return jsonify({"error": "Parámetros inválidos"}), 400
+    correccion = request.args.get('correccion', '') in ('1', 'true', 'si')
+    try:
+        overlay, escenario = resolve_scenario(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    slot = scenario_slot(overlay)
+
+    def parities():
+        # Sin escenario, los conteos de cada distrito ya están en el snapshot
+        if tipo == 'real' and not overlay:
+            return [d.paridad for d in RESULTS_POLLER.snapshot().districts.values()]
+        return [DistrictParity(res, elected)
+                for _, res, elected in compute_districts(tipo, overlay)]
+
+    def corrected():
+        fixed, reemplazos = [], []
+        for d_id, res, elected in compute_districts(tipo, overlay):
+            electos, swaps = parity_correction(res, elected)
+            fixed.append(DistrictParity(res, electos))
+            reemplazos.extend({"distrito": d_id, "sale": res.candidate(i),
+                               "entra": res.candidate(j)} for i, j in swaps)
+        return fixed, reemplazos
+
+    def compute():
+        result = parity_report(
+            RESULT_CACHE.get_or_compute(('paridad', tipo, slot), version, parities),
+            INCENTIVE_PER_WOMAN, distrito)
+        if correccion:
+            fixed, reemplazos = RESULT_CACHE.get_or_compute(
+                ('paridad_correccion', tipo, slot), version, corrected)
+            report = parity_report(fixed, INCENTIVE_PER_WOMAN, distrito)
+            result["correccion"] = {
+                "reemplazos": [r for r in reemplazos
+                               if distrito is None or r['distrito'] == distrito],
+                "diferencia_incentivo": (report["totales"]["incentivo"] -
+                                         result["totales"]["incentivo"]),
+                **{k: report[k] for k in ("totales", "pactos", "partidos", "distritos")}
+            }
+        return {**result, "tipo": tipo, "escenario": escenario}
+
+    version = data_version(tipo)
+    return RESPONSE_CACHE.respond(
+        ('paridad', tipo, slot, distrito, correccion), version, compute)
+
+
+@app.route("/stats/sensibilidad")
+def stats_sensibilidad():
+    """
+    Votos que le faltan a cada pacto (y a cada partido dentro de su pacto)
+    para ganar un escaño más, y cuántos puede perder sin quedarse sin el
+    último. `distrito=` limita el detalle a un distrito.
+    """
+    tipo = request.args.get('tipo', 'real')
+    try:
+        limit = int(request.args.get('limit', 10))
+        distrito = str(int(request.args['distrito'])) if 'distrito' in request.args else None
+    except ValueError:
+        return jsonify({"error": "Parámetros inválidos"}), 400
+    if limit < 0:
+        return jsonify({"error": "Parámetros inválidos"}), 400
+    try:
+        overlay, escenario = resolve_scenario(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    slot = scenario_slot(overlay)
 
-    
-    response_data["nacional"]["candidatos"]["total"] = (
-        response_data["nacional"]["candidatos"]["hombres"] +
-        response_data["nacional"]["candidatos"]["mujeres"]
-    )
-    response_data["nacional"]["electos"]["total"] = (
-        response_data["nacional"]["electos"]["hombres"] +
-        response_data["nacional"]["electos"]["mujeres"]
-    )
+    def compute():
+        return national_sensitivity(
+            [(d_id, res) for d_id, res, _ in compute_districts(tipo, overlay)
+             if res.has_candidates], limit)
 
-   
-    response_data["distritos"].sort(key=lambda x: int(x["distrito"]))
+    def respond():
+        result = RESULT_CACHE.get_or_compute(
+            ('sensibilidad', tipo, slot, limit), version, compute)
+        if distrito:
+            return {**result, "distritos": [
+                d for d in result['distritos'] if d['distrito'] == distrito]}
+        return result
 
-    return jsonify(response_data)
+    version = data_version(tipo)
+    return RESPONSE_CACHE.respond(
+        ('sensibilidad', tipo, slot, limit, distrito), version, respond)
 
 
 @app.route("/stats/fenomenos")
@@ -673,78 +890,148 @@ def stats_fenomenos():
     Identifica:
     1. Arrastrados: Electos con MENOS votos.
     2. Cortados: NO Electos con MÁS votos.
+
+    Paginado con `limit=` y `offset=`; se puede filtrar por `distrito=`,
+    `pacto=`, `genero=` y por votos relativos a la cuota del distrito
+    (votos válidos / escaños) con `cuota_min=` y `cuota_max=`.
     """
     tipo = request.args.get('tipo', 'real')
-    escenario = request.args.get('escenario', '') 
-    limit = int(request.args.get('limit', 10))  
-
-    all_processed_candidates = []
-
-    
-    json_data = None
     try:
-        json_data = requests.get(URL_METADATA_JSON, headers={
-                                 'User-Agent': 'Mozilla/5.0'}, timeout=5).json()
-    except:
-        pass
-
-    def process_district_stats(i):
-        d_id = str(i)
-
-        
-        if tipo == 'real':
-            res = get_real_data_emol(d_id, preloaded_json=json_data)
-        else:
-            res = get_simulation_data(d_id)
-
-        
-        if escenario:
-            res = apply_scenario_logic(res, escenario)
+        limit = int(request.args.get('limit', 10))
+        offset = int(request.args.get('offset', 0))
+        distrito = str(int(request.args['distrito'])) if 'distrito' in request.args else None
+        cuota_min = float(request.args['cuota_min']) if 'cuota_min' in request.args else None
+        cuota_max = float(request.args['cuota_max']) if 'cuota_max' in request.args else None
+    except ValueError:
+        return jsonify({"error": "Parámetros inválidos"}), 400
+    cuotas = [c for c in (cuota_min, cuota_max) if c is not None]
+    if limit < 0 or offset < 0 or not all(map(math.isfinite, cuotas)):
+        return jsonify({"error": "Parámetros inválidos"}), 400
+    pacto = request.args.get('pacto', '').strip().upper() or None
+    genero = request.args.get('genero', '').strip().upper() or None
+    try:
+        overlay, escenario = resolve_scenario(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    slot = scenario_slot(overlay)
+    # Solo pactos y géneros conocidos: los filtros forman parte de las claves de cache
+    known = (set(PACTO_NOMBRES_LOCAL) or set(PACTO_ORDER)) | set(overlay.names if overlay else ())
+    if pacto is not None and pacto not in known:
+        return jsonify({"error": f"Pacto desconocido: {pacto}"}), 400
+    if genero is not None and genero not in GENDERS:
+        return jsonify({"error": f"Género desconocido: {genero}"}), 400
+
+    filtros = {"distrito": distrito, "pacto": pacto, "genero": genero,
+               "cuota_min": cuota_min, "cuota_max": cuota_max}
+
+    def compute():
+        index = RESULT_CACHE.get_or_compute(
+            ('fenomenos', tipo, slot), version,
+            lambda: PhenomenaIndex(compute_districts(tipo, overlay)))
+        arrastrados, mas_arrastrados = index.top(ARRASTRADOS, limit, offset, **filtros)
+        cortados, mas_cortados = index.top(CORTADOS, limit, offset, **filtros)
 
-       
-        elected_list = calculate_dhondt(
-            res['candidates'], res['parties'], res['pacts'], res['seats'])
+        return {
+            "meta": {
+                "total_electos": index.total_electos,
+                "tipo": tipo,
+                "escenario": escenario,
+                "limit": limit,
+                "offset": offset,
+                "filtros": {k: v for k, v in filtros.items() if v is not None},
+                "siguiente": {
+                    "arrastrados": offset + limit if mas_arrastrados else None,
+                    "cortados": offset + limit if mas_cortados else None
+                }
+            },
+            "arrastrados": arrastrados, 
+            "cortados": cortados
+        }
 
-        
-        elected_ids = set(e['_id'] for e in elected_list)
+    version = data_version(tipo)
+    return RESPONSE_CACHE.respond(
+        ('fenomenos', tipo, slot, limit, offset, *filtros.values()), version, compute)
 
-        local_results = []
-        for cand in res['candidates']:
 
-            c_copy = cand.copy()
-            c_copy['is_elected'] = c_copy['_id'] in elected_ids
+@app.route("/historia/progresion")
+def historia_progresion():
+    """
+    Evolución de los conteos a lo largo de la noche. `candidato=` (con
+    `distrito=`) da los votos del candidato; `pacto=` los del pacto en el
+    distrito o en todo el país; sin ellos, el total de votos del XML.
+    `desde=` y `hasta=` aceptan segundos epoch o fechas ISO.
+    """
+    if RESULTS_HISTORY is None:
+        return jsonify({"error": "Historial desactivado"}), 503
+    try:
+        start = parse_time(request.args.get('desde'))
+        end = parse_time(request.args.get('hasta'))
+        distrito = int(request.args['distrito']) if 'distrito' in request.args else None
+        candidato = int(request.args['candidato']) if 'candidato' in request.args else None
+    except ValueError:
+        return jsonify({"error": "Parámetros inválidos"}), 400
+    pacto = request.args.get('pacto')
+    if candidato is not None and distrito is None:
+        return jsonify({"error": "Parámetros inválidos"}), 400
+    distritos = [distrito] if distrito is not None else list(range(1, 29))
+
+    if candidato is not None:
+        points = ((ts, counts.get(candidato, 0))
+                  for ts, _, counts in RESULTS_HISTORY.series(distrito, start, end))
+    elif pacto:
+        try:
+            metadata = METADATA_CACHE.get()
+        except Exception as e:
+            return jsonify({"error": "No se pudo cargar metadata externa", "details": str(e)}), 500
 
-            c_copy['distrito'] = d_id
+        index = METADATA_INDEX.get(metadata)
 
-            pact_obj = next(
-                (p for p in res['pacts'] if p['_id'] == c_copy['pact_id']), None)
-            c_copy['pact_name'] = pact_obj['name'] if pact_obj else c_copy['pact_id']
+        def pact_points(d):
+            pacts = index.candidate_pacts(d)
+            for ts, _, counts in RESULTS_HISTORY.series(d, start, end):
+                yield ts, sum(v for c, v in counts.items() if pacts.get(c) == pacto)
+        points = merge_totals({d: changes(pact_points(d)) for d in distritos})
+    else:
+        points = merge_totals({d: changes((ts, total) for ts, total, _ in
+                                          RESULTS_HISTORY.series(d, start, end))
+                               for d in distritos})
 
-            local_results.append(c_copy)
+    serie = [{"ts": round(ts, 3), "votos": v} for ts, v in changes(points)]
+    return jsonify({"distrito": distrito, "candidato": candidato, "pacto": pacto,
+                    "puntos": len(serie), "serie": serie})
 
-        return local_results
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=14) as executor:
-        results = executor.map(process_district_stats, range(1, 29))
-        for dist_cands in results:
-            all_processed_candidates.extend(dist_cands)
+@app.route("/historia/asignacion")
+def historia_asignacion():
+    """
+    Hemiciclo nacional con los conteos vigentes en el instante `ts=`:
+    cada distrito se reconstruye desde su último conteo completo en el
+    historial, sin recorrer la noche entera. Usa la metadata actual.
+    """
+    if RESULTS_HISTORY is None:
+        return jsonify({"error": "Historial desactivado"}), 503
+    try:
+        ts = parse_time(request.args.get('ts'))
+    except ValueError:
+        return jsonify({"error": "Parámetros inválidos"}), 400
+    if ts is None:
+        return jsonify({"error": "Parámetros inválidos"}), 400
+    try:
+        metadata = METADATA_CACHE.get()
+    except Exception as e:
+        return jsonify({"error": "No se pudo cargar metadata externa", "details": str(e)}), 500
 
-    electos = [c for c in all_processed_candidates if c['is_elected']]
-    
-    arrastrados = sorted(electos, key=lambda x: x['votes'])[:limit]
-    no_electos = [c for c in all_processed_candidates if not c['is_elected']]
-    cortados = sorted(
-        no_electos, key=lambda x: x['votes'], reverse=True)[:limit]
-
-    return jsonify({
-        "meta": {
-            "total_electos": len(electos),
-            "tipo": tipo,
-            "escenario": escenario
-        },
-        "arrastrados": arrastrados, 
-        "cortados": cortados
-    })
+    aggregate = national_aggregate()
+    con_datos = 0
+    for i in range(1, 29):
+        state = RESULTS_HISTORY.state_at(i, ts)
+        if state is not None:
+            con_datos += 1
+        votos_map, total = state or ({}, 0)
+        data = build_real_district(i, votos_map, total, metadata)
+        elected = data.elect() if data.has_candidates else ()
+        aggregate.update(data.distrito, data.candidates_payload(elected), data.pacts_payload())
+    return jsonify({**aggregate.summary(), "ts": ts, "distritos_con_datos": con_datos})
 
 
 if __name__ == "__main__":
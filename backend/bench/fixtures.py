@@ -0,0 +1,55 @@
+import csv
+import json
+import os
+import random
+
+from district_results import URL_METADATA_JSON, URL_XML_TEMPLATE
+from snapshot_archive import SnapshotArchive
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _votes_text(n):
+    # emol usa punto como separador de miles
+    return f"{n:,}".replace(',', '.')
+
+
+def synthetic_documents(seed=1):
+    """
+    dbres.json y los 28 XML de distrito armados desde dip.csv y db.json,
+    con votos pseudoaleatorios (Pareto) fijados por `seed`. Tienen el mismo
+    formato que los archivos de emol, así se ejercitan los mismos parsers.
+    """
+    rng = random.Random(seed)
+    with open(os.path.join(BACKEND_DIR, 'db.json'), encoding='utf-8') as f:
+        db = json.load(f)
+    with open(os.path.join(BACKEND_DIR, 'dip.csv'), encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+
+    dbdp = {}
+    for k, r in enumerate(rows):
+        zona = r['zona']
+        district = dbdp.setdefault(zona, {'q': db['dbzonas'][zona]['q'], 'c': {}})
+        cupo = r['cupo'] if r['cupo'] != r['partido'] and rng.random() < 0.3 else ''
+        district['c'][str(1001 + k)] = {'n': r['nombre'], 'g': r['pacto'], 'p': r['partido'],
+                                        'c': cupo, 's': r['sexo'], 't': r['id_foto']}
+
+    documents = {URL_METADATA_JSON: (
+        json.dumps({'dbg': db['dbpactos'], 'dbdp': dbdp}, ensure_ascii=False).encode('utf-8'),
+        None)}
+    for zona, district in dbdp.items():
+        rows_xml, total = [], 0
+        for c_id in district['c']:
+            v = int(rng.paretovariate(1.2) * 1000) if rng.random() < 0.9 else 0
+            total += v
+            rows_xml.append(f"<ROW><AMBITO>{c_id}</AMBITO><VOTOS>{_votes_text(v)}</VOTOS></ROW>")
+        body = (f"<?xml version='1.0' encoding='utf-8'?><ROWSET><ROW><AMBITO>V</AMBITO>"
+                f"<VOTOS>{_votes_text(int(total * 1.02))}</VOTOS></ROW>{''.join(rows_xml)}</ROWSET>")
+        documents[URL_XML_TEMPLATE.format(d_id=zona)] = (body.encode('utf-8'), None)
+    return documents
+
+
+def write_synthetic_archive(path, seed=1):
+    SnapshotArchive(path).write(synthetic_documents(seed), {"sintetico": True, "semilla": seed})
+    return path
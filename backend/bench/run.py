@@ -0,0 +1,266 @@
+"""
+Benchmarks de los caminos calientes del backend con fixtures locales:
+dip.csv, db.json, encuestas.json y un snapshot de emol (dbres.json + 28
+XML) servido por ArchiveClient en modo replay, sin red.
+
+Uso, desde backend/:
+
+    python -m bench.run                          # tabla con todos los casos
+    python -m bench.run --solo nacional          # casos que contienen 'nacional'
+    python -m bench.run --guardar base.json      # guarda los resultados
+    python -m bench.run --comparar base.json     # sale con 1 si algo empeoró
+
+Sin --archivo se usa un snapshot sintético (bench/fixtures.py); con
+--archivo, uno grabado con `python snapshot_archive.py grabar`.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DISTRICTS = range(1, 29)
+
+
+def configure(archive):
+    """Variables de entorno de app.py; deben quedar antes de importarlo."""
+    os.environ['SNAPSHOT_FILE'] = archive
+    os.environ['SNAPSHOT_MODE'] = 'replay'
+    os.environ['HISTORY_FILE'] = ''
+    # El poller no debe correr en segundo plano durante las mediciones
+    os.environ['RESULTS_POLL_INTERVAL'] = '3600'
+
+
+def parse_elementtree(content):
+    """Parser anterior (árbol completo con ElementTree), como referencia."""
+    votos_map, total = {}, 0
+    raw = content.decode('utf-8-sig', errors='ignore').strip()
+    if not raw.startswith('<'):
+        raw = content.decode('latin-1', errors='ignore').strip()
+    for row in ET.fromstring(raw).findall(".//ROW"):
+        a, v = row.find('AMBITO'), row.find('VOTOS')
+        if a is not None and v is not None:
+            k = a.text.strip()
+            val = int(v.text.replace('.', '')) if v.text else 0
+            if k == 'V':
+                total = val
+            elif k.isdigit():
+                votos_map[k] = val
+    return votos_map, total
+
+
+def build_cases(app):
+    """(nombre, función medida, preparación sin medir o None) de cada caso."""
+    import instrumentation
+    from dhondt import calculate_dhondt
+    from metadata_index import MetadataIndex
+    from district_results import URL_XML_TEMPLATE, _parse_incremental, parse_results_xml
+    from scenarios import scenario_overlay
+
+    metadata = app.METADATA_CACHE.get()
+    districts = [app.load_real_district(i) for i in DISTRICTS]
+    largest = max(districts, key=lambda d: len(d.cand_id)).to_payload()
+    overlay = scenario_overlay('izquierda_unida')
+    documents = app.UPSTREAM_CLIENT.archive.documents()
+    bodies = [documents[URL_XML_TEMPLATE.format(d_id=f"60{i:02d}")][0] for i in DISTRICTS]
+
+    client = app.app.test_client()
+    token = client.post('/login', json={'username': 'admin', 'password': 'admin123'}
+                        ).get_json()['token']
+    auth = {'Authorization': 'Bearer ' + token}
+
+    def ingest():
+        for i, body in zip(DISTRICTS, bodies):
+            votos_map, total = parse_results_xml(body)
+            data = app.build_real_district(i, votos_map, total, metadata)
+            data.elect()
+
+    aggregate = app.national_aggregate()
+    sources = {d.distrito: d for d in districts}
+
+    def aggregate_one():
+        # Un distrito cambia (objeto nuevo) y se arma el hemiciclo
+        d = districts[6]
+        sources[d.distrito] = object()
+        aggregate.update(d.distrito, d.candidates_payload(d.elect()), d.pacts_payload(),
+                         source=sources[d.distrito])
+        aggregate.summary()
+
+    for d in districts:
+        aggregate.update(d.distrito, d.candidates_payload(d.elect()), d.pacts_payload())
+
+    def spans(enabled):
+        def run():
+            previous = instrumentation.is_enabled()
+            instrumentation.configure(enabled)
+            try:
+                for _ in range(1000):
+                    with instrumentation.span('bench', distrito='7'):
+                        pass
+            finally:
+                instrumentation.configure(previous)
+        return run
+
+    def clear_caches():
+        app.RESULT_CACHE.clear()
+        app.RESPONSE_CACHE.cache.clear()
+
+    def get(url, headers=None):
+        def run():
+            r = client.get(url, headers=headers)
+            assert r.status_code == 200, (url, r.status_code)
+        return run
+
+    return [
+        ("dhondt.calculate_dhondt", lambda: calculate_dhondt(
+            largest['candidates'], largest['parties'], largest['pacts'], largest['seats']), None),
+        ("dhondt.elect x28", lambda: [d.elect() for d in districts], None),
+        ("escenario.merge_pacts x28", lambda: [overlay.merge_pacts(d).elect() for d in districts],
+         None),
+        ("simulacion.get_simulation_data x28",
+         lambda: [app.get_simulation_data(i) for i in DISTRICTS], None),
+        ("real.get_real_data_emol x28",
+         lambda: [app.get_real_data_emol(i, metadata) for i in DISTRICTS], None),
+        ("real.indice_metadata x28 (rearmado)", lambda: [
+            MetadataIndex(metadata, app.IMG_BASE_URL).template(i) for i in DISTRICTS], None),
+        ("xml.parse_results_xml x28", lambda: [parse_results_xml(b) for b in bodies], None),
+        ("xml.pull_parser x28", lambda: [_parse_incremental(b, 'utf-8') for b in bodies], None),
+        ("xml.elementtree x28 (referencia)", lambda: [parse_elementtree(b) for b in bodies],
+         None),
+        ("real.ingesta_xml x28", ingest, None),
+        ("nacional.agregado_incremental", aggregate_one, None),
+        ("instrumentacion.span x1000 (desactivado)", spans(False), None),
+        ("instrumentacion.span x1000 (activado)", spans(True), None),
+        ("GET /nacional", get('/nacional'), None),
+        ("GET /nacional?escenario (sin cache)", get('/nacional?escenario=izquierda_unida'),
+         clear_caches),
+        ("GET /nacional?tipo=simulacion (sin cache)", get('/nacional?tipo=simulacion'),
+         clear_caches),
+        ("GET /stats/genero", get('/stats/genero', auth), None),
+        ("GET /stats/paridad (desde el snapshot)", get('/stats/paridad', auth),
+         app.RESPONSE_CACHE.cache.clear),
+        ("GET /stats/paridad?correccion (sin cache)", get('/stats/paridad?correccion=1', auth),
+         clear_caches),
+        ("GET /stats/fenomenos (sin cache)", get('/stats/fenomenos'), clear_caches),
+        ("GET /stats/fenomenos?pacto&genero (indice en cache)",
+         get('/stats/fenomenos?pacto=C&genero=M&cuota_min=0.1&limit=20'),
+         app.RESPONSE_CACHE.cache.clear),
+        ("GET /stats/fenomenos?tipo=simulacion (sin cache)",
+         get('/stats/fenomenos?tipo=simulacion'), clear_caches),
+    ]
+
+
+def measure(fn, before=None, repetitions=50, max_seconds=2.0, warmup=3):
+    for _ in range(warmup):
+        if before:
+            before()
+        fn()
+
+    samples = []
+    deadline = time.perf_counter() + max_seconds
+    while len(samples) < repetitions and (len(samples) < 5 or time.perf_counter() < deadline):
+        if before:
+            before()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    # Memoria en una corrida aparte: tracemalloc distorsiona los tiempos
+    if before:
+        before()
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    samples.sort()
+    q = statistics.quantiles(samples, n=100, method='inclusive')
+    return {
+        "n": len(samples),
+        "ops_s": round(len(samples) / sum(samples), 2),
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p99_ms": round(q[98] * 1000, 3),
+        "pico_kb": round(peak / 1024, 1)
+    }
+
+
+def compare(results, baseline, threshold):
+    """Cambio relativo de p50 y memoria contra `baseline`; True si hay regresión."""
+    regression = False
+    for name, r in results.items():
+        old = baseline.get(name)
+        if old is None:
+            r['comparacion'] = "nuevo"
+            continue
+        p50 = r['p50_ms'] / old['p50_ms'] - 1 if old['p50_ms'] else 0.0
+        mem = r['pico_kb'] / old['pico_kb'] - 1 if old['pico_kb'] else 0.0
+        worse = p50 > threshold or mem > threshold
+        regression |= worse
+        r['comparacion'] = f"p50 {p50:+.0%} mem {mem:+.0%}" + (" REGRESIÓN" if worse else "")
+    return regression
+
+
+def print_table(results):
+    width = max(len(n) for n in results)
+    print(f"{'caso':<{width}}  {'n':>4}  {'ops/s':>9}  {'p50 ms':>9}  {'p99 ms':>9}  {'pico KB':>9}")
+    for name, r in results.items():
+        print(f"{name:<{width}}  {r['n']:>4}  {r['ops_s']:>9.1f}  {r['p50_ms']:>9.3f}  "
+              f"{r['p99_ms']:>9.3f}  {r['pico_kb']:>9.1f}  {r.get('comparacion', '')}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del backend con fixtures locales.")
+    parser.add_argument('--archivo', help="snapshot de emol grabado (por defecto, sintético)")
+    parser.add_argument('--solo', help="corre solo los casos cuyo nombre contiene este texto")
+    parser.add_argument('--repeticiones', type=int, default=50)
+    parser.add_argument('--segundos', type=float, default=2.0,
+                        help="tiempo máximo por caso (mínimo 5 repeticiones)")
+    parser.add_argument('--guardar', help="guarda los resultados en este JSON")
+    parser.add_argument('--comparar', help="JSON guardado antes con --guardar")
+    parser.add_argument('--umbral', type=float, default=0.2,
+                        help="empeoramiento relativo de p50 o memoria tolerado")
+    args = parser.parse_args(argv)
+
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+    from bench.fixtures import write_synthetic_archive
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = args.archivo or write_synthetic_archive(os.path.join(tmp, 'emol.sqlite'))
+        configure(archive)
+        import app
+
+        results = {}
+        for name, fn, before in build_cases(app):
+            if args.solo and args.solo not in name:
+                continue
+            results[name] = measure(fn, before, args.repeticiones, args.segundos)
+
+    regression = False
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            regression = compare(results, json.load(f)['casos'], args.umbral)
+    print_table(results)
+
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as f:
+            json.dump({"meta": {"python": platform.python_version(),
+                                "plataforma": platform.platform(),
+                                "fecha": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                                "archivo": args.archivo or "sintetico"},
+                       "casos": results}, f, indent=2, ensure_ascii=False)
+    return 1 if regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import os
+import threading
+
+import pandas as pd
+
+
+# Columnas de dip.csv que usa la simulación
+SIM_COLUMNS = ['zona', 'pacto', 'partido', 'nombre', 'nombre_full', 'sexo', 'id_foto']
+
+
+class CandidateStore:
+    """
+    Carga dip.csv una sola vez y lo deja particionado por distrito
+    (código de zona 60XX) en forma columnar: cada distrito es un dict
+    columna -> tupla, con las filas en el mismo orden del archivo.
+    """
+
+    def __init__(self, sources):
+        self.sources = [s for s in sources if s]
+        self.source = None
+        self.version = 0
+        self._districts = {}
+        self._lock = threading.Lock()
+
+    def _read_csv(self, source):
+        try:
+            return pd.read_csv(source, encoding="utf-8", usecols=SIM_COLUMNS)
+        except UnicodeDecodeError:
+            return pd.read_csv(source, encoding="latin-1", usecols=SIM_COLUMNS)
+
+    def _partition(self, df):
+        df['zona'] = pd.to_numeric(df['zona'], errors='coerce')
+        df = df[df['zona'].notna()].copy()
+        df['sexo'] = df['sexo'].fillna('N/A')
+
+        districts = {}
+        for zona, group in df.groupby('zona', sort=False):
+            fotos = pd.to_numeric(group['id_foto'], errors='coerce')
+            districts[int(zona)] = {
+                'pacto': tuple(group['pacto'].astype(str)),
+                'partido': tuple(group['partido'].astype(str)),
+                'nombre': tuple(group['nombre']),
+                'nombre_full': tuple(group['nombre_full']),
+                'sexo': tuple(group['sexo']),
+                'id_foto': tuple(int(f) if pd.notna(f) else None for f in fotos),
+            }
+        return districts
+
+    def load(self):
+        """
+        Lee el primer origen disponible (archivo local o URL) y reemplaza
+        la partición completa. Si ningún origen responde se mantiene la
+        data anterior. Retorna True si se cargó algo.
+        """
+        for source in self.sources:
+            if not source.startswith('http') and not os.path.exists(source):
+                continue
+            try:
+                districts = self._partition(self._read_csv(source))
+            except Exception:
+                continue
+
+            with self._lock:
+                self._districts = districts
+                self.source = source
+                self.version += 1
+            return True
+        return False
+
+    def reload(self):
+        return self.load()
+
+    def get(self, distrito_num):
+        """Columnas del distrito (1..28) o None si no hay candidatos."""
+        return self._districts.get(int(f"60{int(distrito_num):02d}"))
+
+    def __len__(self):
+        return sum(len(cols['nombre_full']) for cols in self._districts.values())
@@ -0,0 +1,146 @@
+from dhondt import seats_by_list
+
+
+# Hasta esta cantidad de pactos se evalúan todas las particiones (Bell(8) = 4140)
+MAX_EXHAUSTIVE = 8
+
+
+def set_partitions(items):
+    """Todas las formas de agrupar `items` (particiones del conjunto)."""
+    if not items:
+        yield ()
+        return
+    first, rest = items[0], items[1:]
+    for part in set_partitions(rest):
+        yield ((first,),) + part
+        for i, block in enumerate(part):
+            yield part[:i] + ((first,) + block,) + part[i + 1:]
+
+
+def target_partitions(items, target):
+    """
+    Versión podada para muchos pactos: solo varía el bloque del pacto
+    objetivo (cada subconjunto de socios) y el resto queda sin fusionar.
+    """
+    others = [p for p in items if p != target]
+    for mask in range(1 << len(others)):
+        block = (target,) + tuple(p for i, p in enumerate(others) if mask >> i & 1)
+        yield (block,) + tuple((p,) for p in others if p not in block)
+
+
+def _seats(num_seats, votes, memo):
+    # Los pactos sin votos no influyen: se sacan de la clave del memo
+    positive = [i for i, v in enumerate(votes) if v > 0]
+    key = (num_seats, tuple(votes[i] for i in positive))
+    seats = memo.get(key)
+    if seats is None:
+        won = seats_by_list(key[1], num_seats)
+        seats = memo[key] = tuple(won.get(i, 0) for i in range(len(positive)))
+    out = [0] * len(votes)
+    for i, n in zip(positive, seats):
+        out[i] = n
+    return out
+
+
+def evaluate_groupings(districts, groupings):
+    """
+    Escaños nacionales de cada bloque para cada agrupación. En cada distrito
+    los pactos no fusionados mantienen su orden y los bloques fusionados van
+    al final, igual que un overlay de escenario.
+    """
+    # (escaños, votos fusionados) -> escaños por lista, solo para esta
+    # evaluación: las claves dependen de los votos y no sirven a otra versión
+    memo = {}
+    results = []
+    for grouping in groupings:
+        merged = [b for b in grouping if len(b) > 1]
+        block_of = {pid: i for i, b in enumerate(merged) for pid in b}
+        totals = {b: 0 for b in grouping}
+
+        for num_seats, pacts in districts:
+            owners, votes = [], []
+            merged_votes = [0.0] * len(merged)
+            for pid, v in pacts:
+                i = block_of.get(pid)
+                if i is None:
+                    owners.append((pid,))
+                    votes.append(v)
+                else:
+                    merged_votes[i] += v
+            owners.extend(merged)
+            votes.extend(merged_votes)
+
+            for owner, n in zip(owners, _seats(num_seats, votes, memo)):
+                if n and owner in totals:
+                    totals[owner] += n
+        results.append(totals)
+    return results
+
+
+def _chunks(items, n):
+    size = max(1, -(-len(items) // n))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def grouping_label(grouping):
+    return ",".join("+".join(b) for b in grouping)
+
+
+def search_coalitions(districts, chosen, target, executor=None, workers=1,
+                      max_exhaustive=MAX_EXHAUSTIVE):
+    """
+    Evalúa agrupaciones de los pactos `chosen` y retorna las alianzas
+    Pareto-óptimas para `target`: más escaños para su bloque con menos
+    socios. `districts` es una lista de (escaños, [(pacto, votos), ...]).
+    """
+    chosen = list(chosen)
+    if len(chosen) <= max_exhaustive:
+        mode, groupings = "exhaustiva", list(set_partitions(chosen))
+    else:
+        mode, groupings = "podada", list(target_partitions(chosen, target))
+
+    if executor is None:
+        totals = evaluate_groupings(districts, groupings)
+    else:
+        chunks = _chunks(groupings, workers * 4)
+        totals = [t for part in executor.map(
+            evaluate_groupings, [districts] * len(chunks), chunks) for t in part]
+
+    baseline = evaluate_groupings(districts, [tuple((p,) for p in chosen)])[0]
+    base_seats = {b[0]: n for b, n in baseline.items()}
+
+    rows = []
+    for grouping, total in zip(groupings, totals):
+        block = next(b for b in grouping if target in b)
+        partners = [p for p in block if p != target]
+        seats = total[block]
+        rows.append({
+            "alianza": "+".join(block),
+            "socios": partners,
+            "escanos": seats,
+            "ganancia": seats - sum(base_seats.get(p, 0) for p in block),
+            "agrupacion": grouping_label(grouping),
+            "bloques": {"+".join(b): n for b, n in total.items()}
+        })
+
+    # Frente de Pareto: no existe otra alianza con más escaños y no más socios
+    best_by_size = {}
+    for r in rows:
+        n = len(r['socios'])
+        if n not in best_by_size or r['escanos'] > best_by_size[n]['escanos']:
+            best_by_size[n] = r
+    pareto, best = [], -1
+    for n in sorted(best_by_size):
+        if best_by_size[n]['escanos'] > best:
+            pareto.append(best_by_size[n])
+            best = best_by_size[n]['escanos']
+
+    rows.sort(key=lambda r: (-r['escanos'], len(r['socios'])))
+    return {
+        "modo": mode,
+        "evaluadas": len(groupings),
+        "base": {"pacto": target, "escanos": base_seats.get(target, 0),
+                 "bloques": {p: base_seats.get(p, 0) for p in chosen}},
+        "pareto": pareto,
+        "mejores": rows
+    }
@@ -0,0 +1,86 @@
+import heapq
+from operator import itemgetter
+from collections import defaultdict
+from dataclasses import asdict
+
+
+def iter_dhondt(votes, caps=None):
+    """
+    Recorre los cocientes D'Hondt de mayor a menor sin construir la tabla
+    completa: retorna el índice de la lista dueña de cada cociente.
+    Los empates se resuelven por orden de la lista (índice menor primero),
+    igual que un sort estable sobre la tabla generada lista por lista.
+    `caps` limita cuántos cocientes puede aportar cada lista.
+    """
+    heap = []
+    for idx, v in enumerate(votes):
+        if v > 0 and (caps is None or caps[idx] > 0):
+            heap.append((-v, idx, 1))
+    heapq.heapify(heap)
+
+    while heap:
+        _, idx, i = heap[0]
+        yield idx
+        if caps is None or i < caps[idx]:
+            heapq.heapreplace(heap, (-(votes[idx] / (i + 1)), idx, i + 1))
+        else:
+            heapq.heappop(heap)
+
+
+def seats_by_list(votes, num_seats, caps=None):
+    """Escaños por lista, en el orden en que cada lista ganó su primer escaño."""
+    seats = {}
+    for n, idx in enumerate(iter_dhondt(votes, caps)):
+        if n >= num_seats:
+            break
+        seats[idx] = seats.get(idx, 0) + 1
+    return seats
+
+
+def calculate_dhondt(candidates_list, parties_list, pacts_list, num_seats):
+    """
+    Asigna `num_seats` escaños: primero entre pactos y luego, dentro de cada
+    pacto, entre sus partidos (cada partido elige a sus candidatos en orden
+    de votación y no puede ganar más escaños que candidatos tiene).
+    Retorna los electos ordenados por votos.
+    """
+    pact_votes = {p['_id']: p['votes'] for p in pacts_list}
+    party_votes = {p['_id']: p['votes'] for p in parties_list}
+    party_to_pact = {p['_id']: p['list_id'] for p in parties_list}
+
+    party_candidates = defaultdict(list)
+    for c in candidates_list:
+        party_candidates[c['party_id']].append(c)
+
+    for pid in party_candidates:
+        party_candidates[pid].sort(key=itemgetter('votes'), reverse=True)
+
+    pact_ids = list(pact_votes)
+    seats_per_pact = seats_by_list(
+        [pact_votes[pid] for pid in pact_ids], num_seats)
+
+    parties_by_pact = defaultdict(list)
+    for party_id, lid in party_to_pact.items():
+        parties_by_pact[lid].append(party_id)
+
+    elected, elected_ids = [], set()
+    for pact_idx, seats_won in seats_per_pact.items():
+        members = parties_by_pact.get(pact_ids[pact_idx], [])
+        votes = [party_votes.get(pid, 0) for pid in members]
+        caps = [len(party_candidates.get(pid, ())) for pid in members]
+        taken = [0] * len(members)
+
+        seats_assigned = 0
+        for idx in iter_dhondt(votes, caps):
+            if seats_assigned >= seats_won:
+                break
+            candidate = party_candidates[members[idx]][taken[idx]]
+            taken[idx] += 1
+            if candidate['_id'] not in elected_ids:
+                elected_ids.add(candidate['_id'])
+                elected.append(candidate)
+                seats_assigned += 1
+
+    final = [asdict(c) if not isinstance(c, dict) else c for c in elected]
+    final.sort(key=itemgetter('votes'), reverse=True)
+    return final
@@ -0,0 +1,207 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+class DistrictTables:
+    """
+    Índices fijos de un distrito (pactos, partidos y candidatos como
+    posiciones enteras) para calcular D'Hondt sobre muchos escenarios
+    de votación a la vez. Se arma una vez desde la data del distrito.
+    """
+
+    def __init__(self, candidates, parties, pacts):
+        pact_votes = {p['_id']: p['votes'] for p in pacts}
+        party_votes = {p['_id']: p['votes'] for p in parties}
+        party_to_pact = {p['_id']: p['list_id'] for p in parties}
+
+        self.pact_ids = list(pact_votes)
+        self.party_ids = list(party_to_pact)
+        self.candidates = list(candidates)
+
+        pact_pos = {pid: i for i, pid in enumerate(self.pact_ids)}
+        party_pos = {pid: i for i, pid in enumerate(self.party_ids)}
+
+        self.pact_votes = np.array([pact_votes[p] for p in self.pact_ids], dtype=float)
+        self.party_votes = np.array([party_votes[p] for p in self.party_ids], dtype=float)
+        self.party_pact = np.array(
+            [pact_pos.get(party_to_pact[p], -1) for p in self.party_ids], dtype=np.int64)
+        self.cand_party = np.array(
+            [party_pos.get(c['party_id'], -1) for c in self.candidates], dtype=np.int64)
+        self.cand_votes = np.array([c['votes'] for c in self.candidates], dtype=float)
+        self._index()
+
+    @classmethod
+    def from_district(cls, district):
+        """Tablas desde un DistrictData, usando sus columnas sin armar dicts."""
+        tables = cls.__new__(cls)
+        tables.pact_ids = list(district.pact_id)
+        tables.party_ids = list(district.party_id)
+        tables.candidates = district.candidate_rows()
+        tables.pact_votes = np.array(district.pact_votes, dtype=float)
+        tables.party_votes = np.array(district.party_votes, dtype=float)
+        tables.party_pact = np.array(district.party_pact, dtype=np.int64)
+        tables.cand_party = np.array(district.cand_party, dtype=np.int64)
+        tables.cand_votes = np.array(district.cand_votes, dtype=float)
+        tables._index()
+        return tables
+
+    def _index(self):
+        self.party_caps = np.bincount(
+            self.cand_party[self.cand_party >= 0], minlength=len(self.party_ids))
+
+        # Partidos de cada pacto, en el orden de la lista de partidos
+        self.pact_members = [np.flatnonzero(self.party_pact == i)
+                             for i in range(len(self.pact_ids))]
+        # Posición de cada candidato dentro de su partido (orden por votos)
+        self.cand_rank = _ranks_within_party(
+            self.cand_votes[None, :], self.cand_party, len(self.party_ids))[0]
+        # Matrices de pertenencia para `aggregate`, se arman al primer uso
+        self._cand_to_party = None
+        self._party_to_pact = None
+
+    @property
+    def shape(self):
+        return len(self.pact_ids), len(self.party_ids), len(self.candidates)
+
+    def aggregate(self, cand_votes):
+        """Votos por partido y pacto (escenarios x listas) desde votos por candidato."""
+        if self._cand_to_party is None:
+            C, Q, P = len(self.candidates), len(self.party_ids), len(self.pact_ids)
+            self._cand_to_party = np.zeros((C, Q))
+            valid = np.flatnonzero(self.cand_party >= 0)
+            self._cand_to_party[valid, self.cand_party[valid]] = 1.0
+            self._party_to_pact = np.zeros((Q, P))
+            valid = np.flatnonzero(self.party_pact >= 0)
+            self._party_to_pact[valid, self.party_pact[valid]] = 1.0
+
+        party = np.atleast_2d(cand_votes) @ self._cand_to_party
+        return party @ self._party_to_pact, party
+
+
+@dataclass
+class BatchResult:
+    pact_seats: np.ndarray    # (escenarios, pactos)
+    party_seats: np.ndarray   # (escenarios, partidos)
+    elected: np.ndarray       # (escenarios, candidatos) bool
+    seat_order: np.ndarray    # orden de asignación dentro del pacto, -1 si no es electo
+
+
+def _ranks_within_party(cand_votes, cand_party, n_parties):
+    """Posición de cada candidato en su partido, por votos desc (estable)."""
+    S, C = cand_votes.shape
+    by_votes = np.argsort(-cand_votes, axis=1, kind='stable')
+    by_party = np.argsort(cand_party[by_votes], axis=1, kind='stable')
+    order = np.take_along_axis(by_votes, by_party, axis=1)
+
+    counts = np.bincount(cand_party[cand_party >= 0], minlength=n_parties)
+    starts = np.concatenate(([0], np.cumsum(counts)))
+    # Los candidatos sin partido (-1) quedan al inicio del orden
+    offset = int(np.sum(cand_party < 0))
+    party_sorted = cand_party[order]
+    pos = np.arange(C)[None, :] - offset - starts[np.maximum(party_sorted, 0)]
+
+    ranks = np.empty((S, C), dtype=np.int64)
+    np.put_along_axis(ranks, order, pos, axis=1)
+    ranks[:, cand_party < 0] = -1
+    return ranks
+
+
+def _top_k(q, k):
+    """
+    Máscara de los k mayores cocientes por fila. Los empates se resuelven
+    por posición (la lista/divisor que aparece antes en la tabla gana).
+    """
+    kth = np.partition(q, q.shape[1] - k, axis=1)[:, q.shape[1] - k]
+    greater = q > kth[:, None]
+    ties = q == kth[:, None]
+    need = k - greater.sum(axis=1)
+    take = ties & (np.cumsum(ties, axis=1) <= need[:, None])
+    return (greater | take) & np.isfinite(q)
+
+
+def dhondt_batch(tables, pact_votes, party_votes, num_seats, cand_votes=None):
+    """
+    D'Hondt de dos etapas para S escenarios del mismo distrito.
+    `pact_votes` es (S, pactos) y `party_votes` es (S, partidos), en el orden
+    de `tables`. Si se entrega `cand_votes` (S, candidatos) el orden dentro de
+    cada partido se recalcula por escenario; si no, se usa el de la data base.
+    """
+    pact_votes = np.atleast_2d(np.asarray(pact_votes, dtype=float))
+    party_votes = np.atleast_2d(np.asarray(party_votes, dtype=float))
+    S, P = pact_votes.shape
+    Q, C = len(tables.party_ids), len(tables.candidates)
+
+    pact_seats = np.zeros((S, P), dtype=np.int64)
+    if num_seats > 0 and P > 0:
+        div = np.arange(1, num_seats + 1, dtype=float)
+        q = np.where(pact_votes[:, :, None] > 0,
+                     pact_votes[:, :, None] / div, -np.inf).reshape(S, P * num_seats)
+        k = min(num_seats, q.shape[1])
+        pact_seats = _top_k(q, k).reshape(S, P, num_seats).sum(axis=2)
+
+    party_seats = np.zeros((S, Q), dtype=np.int64)
+    party_order = np.full((S, Q, max(int(tables.party_caps.max(initial=0)), 1)), -1,
+                          dtype=np.int64)
+    for p, members in enumerate(tables.pact_members):
+        if len(members) == 0:
+            continue
+        caps = tables.party_caps[members]
+        M = int(caps.max(initial=0))
+        if M == 0 or not pact_seats[:, p].any():
+            continue
+        # Nunca se asignan más escaños que los ganados por el pacto
+        M = min(M, int(pact_seats[:, p].max()))
+        div = np.arange(1, M + 1, dtype=float)
+        votes = party_votes[:, members]
+        valid = (votes[:, :, None] > 0) & (div[None, None, :] <= caps[None, :, None])
+        q = np.where(valid, votes[:, :, None] / div, -np.inf).reshape(S, len(members) * M)
+
+        order = np.argsort(-q, axis=1, kind='stable')
+        pos = np.empty_like(order)
+        np.put_along_axis(pos, order, np.arange(q.shape[1])[None, :], axis=1)
+        win = (pos < pact_seats[:, p][:, None]) & np.isfinite(q)
+
+        win = win.reshape(S, len(members), M)
+        party_seats[:, members] = win.sum(axis=2)
+        party_order[:, members, :M] = np.where(win, pos.reshape(S, len(members), M), -1)
+
+    if cand_votes is None:
+        ranks = np.broadcast_to(tables.cand_rank, (S, C))
+    else:
+        ranks = _ranks_within_party(np.atleast_2d(cand_votes), tables.cand_party, Q)
+
+    has_party = tables.cand_party >= 0
+    cp = np.maximum(tables.cand_party, 0)
+    cand_seats = party_seats[:, cp] if Q else np.zeros((S, C), dtype=np.int64)
+    elected = has_party[None, :] & (ranks >= 0) & (ranks < cand_seats)
+
+    seat_order = np.full((S, C), -1, dtype=np.int64)
+    rows, cols = np.nonzero(elected)
+    seat_order[rows, cols] = party_order[rows, cp[cols], ranks[rows, cols]]
+
+    return BatchResult(pact_seats, party_seats, elected, seat_order)
+
+
+def elected_candidates(tables, result, scenario=0, pact_votes=None, cand_votes=None):
+    """
+    Lista de electos de un escenario con el mismo orden que calculate_dhondt:
+    votos desc y, en empate, el orden en que se asignaron los escaños.
+    """
+    pv = tables.pact_votes if pact_votes is None else np.atleast_2d(pact_votes)[scenario]
+    # Los pactos se recorren en el orden en que ganaron su primer escaño
+    pact_rank = np.empty(len(pv), dtype=np.int64)
+    pact_rank[np.lexsort((np.arange(len(pv)), -pv))] = np.arange(len(pv))
+
+    if cand_votes is None:
+        votes = tables.cand_votes
+        build = lambda i: tables.candidates[i]
+    else:
+        votes = np.atleast_2d(cand_votes)[scenario]
+        build = lambda i: {**tables.candidates[i], 'votes': float(votes[i])}
+
+    idx = np.flatnonzero(result.elected[scenario])
+    pact_of = tables.party_pact[tables.cand_party[idx]]
+    keys = sorted(zip(-votes[idx], pact_rank[pact_of],
+                      result.seat_order[scenario, idx], idx))
+    return [build(int(i)) for _, _, _, i in keys]
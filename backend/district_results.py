@@ -0,0 +1,267 @@
+import codecs
+import re
+import threading
+import xml.etree.ElementTree as ET
+from array import array
+
+import requests
+
+from http_cache import CachedResource
+
+
+URL_METADATA_JSON = "https://static.emol.cl/emol50/especiales/js/2025/elecciones/dbres.json"
+URL_XML_TEMPLATE = "https://www.emol.com/nacional/especiales/2025/presidenciales/dip_{d_id}.xml"
+
+
+# Votos de emol: enteros con punto como separador de miles ("1.053") o vacío.
+# A lo más 18 dígitos, así cualquier valor aceptado cabe en un int64
+_VOTES = rb'\s*(\d{1,3}(?:\.\d{3}){1,5}|\d{0,18})\s*'
+# Fila canónica de emol; cualquier otra forma se lee con el parser XML
+_ROW = re.compile(rb'<ROW>\s*<AMBITO>\s*([^<\s]*)\s*</AMBITO>\s*<VOTOS>' + _VOTES
+                  + rb'</VOTOS>\s*</ROW>')
+_VOTES_TEXT = re.compile(_VOTES.decode('ascii'), re.ASCII)
+_END = re.compile(rb'</ROWSET>\s*\Z')
+_DECLARED = re.compile(rb'^\s*<\?xml[^>]*encoding=["\']([A-Za-z0-9._-]+)["\']')
+
+
+class ResultsParseError(ValueError):
+    """XML de distrito mal formado, incompleto o con votos que no son enteros."""
+
+    def __init__(self, message, rows=0, partial=False):
+        super().__init__(message)
+        self.rows = rows
+        self.partial = partial
+
+
+class DistrictUnavailable(RuntimeError):
+    """
+    No hay votos confiables para el distrito: su XML no se pudo descargar
+    o parsear y no queda una copia anterior buena. El distrito se informa
+    como no disponible en vez de contarlo con votos en cero.
+    """
+
+    def __init__(self, distrito, cause):
+        super().__init__(f"Distrito {distrito} no disponible: {cause}")
+        self.distrito = distrito
+        self.cause = cause
+
+
+class ResultCounts:
+    """
+    Votos de un XML de distrito: ids de candidato en el orden del archivo
+    y sus votos en un array paralelo. Se usa como un dict id -> votos de
+    solo lectura (`get`, `items`); el índice por id se arma al primer uso.
+    """
+
+    __slots__ = ('ids', 'votes', '_index')
+
+    def __init__(self, ids, votes):
+        self.ids = ids
+        self.votes = votes
+        self._index = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def _positions(self):
+        if self._index is None:
+            # Con ids repetidos vale el último, igual que al llenar un dict
+            self._index = {cid: k for k, cid in enumerate(self.ids)}
+        return self._index
+
+    def __contains__(self, cand_id):
+        return cand_id in self._positions()
+
+    def get(self, cand_id, default=None):
+        k = self._positions().get(cand_id)
+        return default if k is None else self.votes[k]
+
+    def items(self):
+        votes = self.votes
+        return ((cid, votes[k]) for cid, k in self._positions().items())
+
+
+def _detect_encoding(content):
+    """
+    Se detecta una sola vez: BOM o declaración XML. Las codificaciones
+    compatibles con ASCII se escanean tal cual (AMBITO y VOTOS son ASCII);
+    UTF-16/32 se pasan a UTF-8 para el escaneo rápido.
+    """
+    for bom, codec in ((codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+                       (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'),
+                       (codecs.BOM_UTF8, 'utf-8')):
+        if content.startswith(bom):
+            return codec
+    declared = _DECLARED.match(content)
+    return declared.group(1).decode('ascii').lower() if declared else None
+
+
+def _split_total(ids, votes):
+    """Separa la fila 'V' (total) y descarta ámbitos que no son candidatos."""
+    total = 0
+    for k in [k for k, a in enumerate(ids) if not (a.isascii() and a.isdigit())][::-1]:
+        if ids[k] == 'V':
+            total = votes[k]
+        del ids[k]
+        del votes[k]
+    return ids, votes, total
+
+
+def _scan_canonical(content):
+    """
+    Camino rápido para el formato de emol: un solo recorrido de la regex
+    de fila sobre los bytes y conversión de todos los votos de una vez.
+    Retorna None si el archivo no es exactamente una lista de filas
+    canónicas terminada en </ROWSET>.
+    """
+    rows = _ROW.findall(content)
+    if (not rows or len(rows) != content.count(b'<ROW') - content.count(b'<ROWSET')
+            or _END.search(content, max(0, len(content) - 64)) is None):
+        return None
+    ids, votes = zip(*rows)
+    if b'' in votes:
+        votes = [v or b'0' for v in votes]
+    # La regex ya validó cada número (sin signo, a lo más 18 dígitos)
+    votes = array('q', map(int, b' '.join(votes).replace(b'.', b'').split()))
+
+    # latin-1 nunca falla y deja iguales los dígitos y la 'V'
+    text = b' '.join(ids).decode('latin-1')
+    ids = text.split(' ')
+    digits = text.replace(' ', '')
+    if digits.count('V') == 1 and 'V' in ids and '' not in ids:
+        digits = digits.replace('V', '')
+        if digits.isascii() and digits.isdigit():
+            # Caso común: la única fila que no es de candidato es la del total
+            k = ids.index('V')
+            total = votes[k]
+            del ids[k], votes[k]
+            return ids, votes, total
+    return _split_total(ids, votes)
+
+
+def _votes_value(text, ambito, row):
+    m = _VOTES_TEXT.fullmatch(text or '')
+    if m is None:
+        raise ResultsParseError(
+            f"VOTOS no es un entero en la fila {row + 1} (AMBITO {ambito!r}): {text!r}", rows=row)
+    return int(m.group(1).replace('.', '') or 0)
+
+
+def _parse_incremental(content, encoding, chunk_size=16384):
+    """
+    Camino general: XMLPullParser alimentado por bloques con los bytes
+    crudos. Cada ROW se lee al cerrarse y se descarta, y los votos van a
+    un array reservado con la cantidad de filas del archivo.
+    """
+    if encoding is None:
+        try:
+            content.decode('utf-8')
+        except UnicodeDecodeError:
+            # Sin declaración y no es UTF-8: se lee como latin-1
+            content = b"<?xml version='1.0' encoding='iso-8859-1'?>" + content
+
+    n = max(0, content.count(b'<ROW') - content.count(b'<ROWSET'))
+    ids, votes = [None] * n, array('q', bytes(8 * n))
+    k = 0
+    parser = ET.XMLPullParser(events=('end',))
+    try:
+        for start in range(0, len(content), chunk_size):
+            parser.feed(content[start:start + chunk_size])
+            for _, elem in parser.read_events():
+                if elem.tag != 'ROW':
+                    continue
+                ambito, text = elem.findtext('AMBITO'), elem.findtext('VOTOS')
+                if ambito is None or text is None:
+                    raise ResultsParseError(f"Fila {k + 1} sin AMBITO o VOTOS", rows=k)
+                ids[k] = ambito.strip()
+                votes[k] = _votes_value(text, ids[k], k)
+                k += 1
+                elem.clear()
+        parser.close()
+    except ET.ParseError as e:
+        line, column = e.position
+        partial = 'no element found' in str(e) or 'unclosed token' in str(e)
+        kind = "incompleto" if partial else "mal formado"
+        raise ResultsParseError(
+            f"XML {kind} en línea {line}, columna {column} tras {k} filas: {e}",
+            rows=k, partial=partial) from None
+    if k == 0:
+        raise ResultsParseError("XML sin filas de resultados (ROW)")
+    del ids[k:], votes[k:]
+    return _split_total(ids, votes)
+
+
+def parse_results_xml(content):
+    """
+    Votos por candidato de un XML de distrito de emol desde los bytes
+    crudos. Retorna (ResultCounts, total_votos_xml); la fila AMBITO 'V'
+    trae el total. Un archivo mal formado, cortado o con votos no enteros
+    lanza ResultsParseError en vez de dejar votos en cero.
+    """
+    encoding = _detect_encoding(content)
+    try:
+        scan = content
+        if encoding in ('utf-16', 'utf-32'):
+            scan = content.decode(encoding).encode('utf-8')
+        parsed = _scan_canonical(scan)
+        if parsed is None:
+            parsed = _parse_incremental(content, encoding)
+    except ResultsParseError:
+        raise
+    except (UnicodeError, LookupError, ValueError) as e:
+        # Bytes que no calzan con la codificación o codificación desconocida
+        raise ResultsParseError(f"XML con codificación inválida ({encoding}): {e}") from None
+    ids, votes, total = parsed
+    return ResultCounts(ids, votes), total
+
+
+class DistrictResultsCache:
+    """
+    Un CachedResource por XML de distrito (dip_60XX.xml). Cada distrito
+    tiene su propio TTL, ETag y hash de contenido, así un XML sin cambios
+    no se vuelve a parsear y su `version` se mantiene. Los listeners
+    registrados con `add_listener` reciben (d_id, (votos_map, total)) cada
+    vez que se parsea un XML nuevo.
+    """
+
+    def __init__(self, ttl=15, timeout=4, client=requests):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.client = client
+        self._resources = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _parse(self, d_id, content):
+        value = parse_results_xml(content)
+        for listener in self._listeners:
+            listener(d_id, value)
+        return value
+
+    def resource(self, d_id):
+        with self._lock:
+            res = self._resources.get(d_id)
+            if res is None:
+                res = self._resources[d_id] = CachedResource(
+                    URL_XML_TEMPLATE.format(d_id=d_id),
+                    lambda r, d_id=d_id: self._parse(d_id, r.content),
+                    ttl=self.ttl, timeout=self.timeout,
+                    headers={'User-Agent': 'Mozilla/5.0'}, client=self.client, name=d_id)
+        return res
+
+    def get(self, d_id):
+        return self.resource(d_id).get()
+
+    def version(self, d_id):
+        return self.resource(d_id).version
+
+    def info(self):
+        with self._lock:
+            items = sorted(self._resources.items())
+        return {d_id: res.info() for d_id, res in items}
@@ -0,0 +1,221 @@
+import datetime
+import heapq
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter
+
+
+# Cada cuántos deltas de un distrito se guarda su conteo completo
+KEYFRAME_EVERY = 32
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conteos (
+    distrito INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    completo INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    candidatos BLOB NOT NULL,
+    votos BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conteos_distrito_ts ON conteos (distrito, ts);
+"""
+
+
+def parse_time(value, default=None):
+    """Segundos epoch o fecha ISO 8601 (sin zona se asume UTC)."""
+    if value in (None, ''):
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    dt = datetime.datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.timestamp()
+
+
+def _unpack(blob, typecode):
+    values = array(typecode)
+    values.frombytes(blob)
+    return values
+
+
+class ResultsHistory:
+    """
+    Historial append-only de los conteos de cada XML de distrito en sqlite.
+    Cada fila es un delta de un distrito en un instante: los ids de los
+    candidatos cuyo conteo cambió y sus votos nuevos como arrays empacados,
+    más el total del XML. Cada KEYFRAME_EVERY deltas se guarda el conteo
+    completo, así reconstruir un distrito en cualquier instante lee a lo
+    más esa cantidad de filas por el índice (distrito, ts).
+
+    En memoria solo queda el último conteo de cada distrito para calcular
+    el próximo delta; las consultas recorren el cursor sin cargar todo.
+    """
+
+    def __init__(self, path, keyframe_every=KEYFRAME_EVERY):
+        self.path = path
+        self.keyframe_every = keyframe_every
+        self.stats = Counter()
+        self._conn = None
+        # distrito -> (conteo, total, ts, deltas desde el último completo)
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def _writer(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _reader(self):
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+
+    def _restore(self, conn, distrito):
+        """Último estado guardado de un distrito (p. ej. tras reiniciar)."""
+        state, total, ts, since = None, 0, 0.0, 0
+        for row_ts, full, row_total, cands, votes in self._rows(
+                conn, distrito, float('inf'), float('inf')):
+            if full:
+                state, since = {}, 0
+            else:
+                since += 1
+            state.update(zip(_unpack(cands, 'i'), _unpack(votes, 'q')))
+            total, ts = row_total, row_ts
+        return state, total, ts, since
+
+    def record(self, distrito, votos_map, total, ts=None):
+        """
+        Agrega el conteo de un distrito si cambió respecto del anterior.
+        `votos_map` es {id de candidato: votos} tal como sale del XML.
+        """
+        votes = {int(c): int(v) for c, v in votos_map.items()}
+        try:
+            with self._lock:
+                conn = self._writer()
+                last = self._last.get(distrito)
+                if last is None:
+                    last = self._restore(conn, distrito)
+                state, prev_total, prev_ts, since = last
+                # El tiempo de un distrito nunca retrocede (ajustes de reloj)
+                ts = max(time.time() if ts is None else ts, prev_ts)
+
+                if state is None or since + 1 >= self.keyframe_every:
+                    changed, full, since, state = votes, 1, 0, dict(votes)
+                else:
+                    changed = {c: v for c, v in votes.items() if state.get(c, 0) != v}
+                    changed.update({c: 0 for c, v in state.items() if v and c not in votes})
+                    if not changed and total == prev_total:
+                        self.stats['unchanged'] += 1
+                        return False
+                    full, since = 0, since + 1
+                    state = {**state, **changed}
+
+                ids = sorted(changed)
+                with conn:
+                    conn.execute("INSERT INTO conteos VALUES (?, ?, ?, ?, ?, ?)", (
+                        distrito, ts, full, int(total),
+                        array('i', ids).tobytes(),
+                        array('q', [changed[c] for c in ids]).tobytes()))
+                self._last[distrito] = (state, total, ts, since)
+                self.stats['keyframes' if full else 'deltas'] += 1
+                return True
+        except sqlite3.Error:
+            # El historial nunca debe cortar la ingesta de resultados
+            self.stats['errors'] += 1
+            return False
+
+    def _rows(self, conn, distrito, start, end):
+        """Filas del distrito desde el último conteo completo en o antes de `start` hasta `end`."""
+        keyframe = conn.execute(
+            "SELECT rowid FROM conteos WHERE distrito = ? AND completo = 1 AND ts <= ? "
+            "ORDER BY ts DESC, rowid DESC LIMIT 1", (distrito, start)).fetchone()
+        return conn.execute(
+            "SELECT ts, completo, total, candidatos, votos FROM conteos "
+            "WHERE distrito = ? AND ts <= ? AND rowid >= ? ORDER BY ts, rowid",
+            (distrito, end, keyframe[0] if keyframe else 0))
+
+    def _replay(self, distrito, start, end):
+        try:
+            conn = self._reader()
+        except sqlite3.Error:
+            return
+        try:
+            state = {}
+            for ts, full, total, cands, votes in self._rows(conn, distrito, start, end):
+                if full:
+                    state = {}
+                state.update(zip(_unpack(cands, 'i'), _unpack(votes, 'q')))
+                yield ts, total, state
+        except sqlite3.Error:
+            return
+        finally:
+            conn.close()
+
+    def series(self, distrito, start=None, end=None):
+        """
+        (ts, total, conteo) de cada cambio del distrito entre `start` y
+        `end`. `conteo` es el mismo dict actualizado en cada paso: se debe
+        leer antes de pedir el siguiente.
+        """
+        start = float('-inf') if start is None else start
+        end = float('inf') if end is None else end
+        for ts, total, state in self._replay(distrito, start, end):
+            if ts >= start:
+                yield ts, total, state
+
+    def state_at(self, distrito, ts):
+        """(votos_map, total) del distrito en el instante `ts`, o None si aún no había datos."""
+        found = None
+        for _, total, counts in self._replay(distrito, ts, ts):
+            found = (counts, total)
+        if found is None:
+            return None
+        return {str(c): v for c, v in found[0].items()}, found[1]
+
+    def info(self):
+        try:
+            conn = self._reader()
+        except sqlite3.Error:
+            return {"archivo": self.path, "filas": 0, **self.stats}
+        try:
+            rows, first, last = conn.execute(
+                "SELECT COUNT(*), MIN(ts), MAX(ts) FROM conteos").fetchone()
+        except sqlite3.Error:
+            rows, first, last = 0, None, None
+        finally:
+            conn.close()
+        return {"archivo": self.path, "filas": rows, "desde": first, "hasta": last,
+                **self.stats}
+
+
+def changes(points):
+    """Deja solo los puntos (ts, valor) en que el valor cambia."""
+    last = object()
+    for ts, value in points:
+        if value != last:
+            last = value
+            yield ts, value
+
+
+def merge_totals(series_by_district):
+    """
+    Une series (ts, valor) de varios distritos en una serie de la suma
+    nacional, avanzando por orden de tiempo con heapq.merge.
+    """
+    def tagged(distrito, points):
+        for ts, value in points:
+            yield ts, distrito, value
+
+    current, total = {}, 0
+    merged = heapq.merge(*(tagged(d, s) for d, s in series_by_district.items()))
+    for ts, distrito, value in merged:
+        total += value - current.get(distrito, 0)
+        current[distrito] = value
+        yield ts, total
@@ -0,0 +1,124 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+import requests
+
+from instrumentation import span
+
+
+class CachedResource:
+    """
+    Documento remoto compartido entre requests. Mientras esté fresco (TTL)
+    se sirve desde memoria; al vencer se revalida con If-None-Match /
+    If-Modified-Since. Solo un hilo descarga a la vez (single-flight): el
+    resto espera esa misma descarga. Si el origen falla se sigue sirviendo
+    la última copia buena. Si el cuerpo descargado es idéntico al anterior
+    (mismo hash) no se vuelve a parsear ni cambia `version`.
+    """
+
+    def __init__(self, url, parse, ttl=60, timeout=5, headers=None, retry_after=5,
+                 client=requests, name=None):
+        self.url = url
+        # Nombre corto para las métricas (por defecto la URL)
+        self.name = name or url
+        self.client = client
+        self.parse = parse
+        self.ttl = ttl
+        self.timeout = timeout
+        self.headers = headers or {}
+        # Tras un error, segundos antes de volver a intentar contra el origen
+        self.retry_after = retry_after
+
+        self.value = None
+        self.version = 0
+        self.etag = None
+        self.last_modified = None
+        self.content_hash = None
+        self.fetched_at = 0.0
+        self.expires_at = 0.0
+        self.stats = Counter()
+
+        self._lock = threading.Lock()
+        self._inflight = None
+        self._error = None
+
+    def get(self):
+        with self._lock:
+            if self.value is not None and time.monotonic() < self.expires_at:
+                self.stats['hits'] += 1
+                return self.value
+
+            self.stats['misses'] += 1
+            event = self._inflight
+            leader = event is None
+            if leader:
+                event = self._inflight = threading.Event()
+            else:
+                self.stats['coalesced'] += 1
+
+        if leader:
+            try:
+                self._refresh()
+            finally:
+                with self._lock:
+                    self._inflight = None
+                event.set()
+        else:
+            event.wait(self.timeout + 1)
+
+        if self.value is None:
+            raise self._error or RuntimeError(f"Sin datos para {self.url}")
+        return self.value
+
+    def _refresh(self):
+        headers = dict(self.headers)
+        if self.value is not None:
+            if self.etag:
+                headers['If-None-Match'] = self.etag
+            if self.last_modified:
+                headers['If-Modified-Since'] = self.last_modified
+
+        try:
+            with span('upstream', recurso=self.name):
+                r = self.client.get(self.url, headers=headers, timeout=self.timeout)
+            if r.status_code == 304 and self.value is not None:
+                self.stats['not_modified'] += 1
+            else:
+                r.raise_for_status()
+                digest = hashlib.sha1(r.content).hexdigest()
+                if digest == self.content_hash and self.value is not None:
+                    self.stats['unchanged'] += 1
+                else:
+                    with span('parse', recurso=self.name):
+                        value = self.parse(r)
+                    with self._lock:
+                        self.value = value
+                        self.version += 1
+                        self.content_hash = digest
+                    self.stats['downloads'] += 1
+                self.etag = r.headers.get('ETag')
+                self.last_modified = r.headers.get('Last-Modified')
+            self.fetched_at = time.monotonic()
+            self.expires_at = self.fetched_at + self.ttl
+            self._error = None
+        except Exception as e:
+            self._error = e
+            self.stats['errors'] += 1
+            if self.value is not None:
+                self.stats['stale'] += 1
+                # Se sigue usando la copia anterior y se reintenta más tarde
+                self.expires_at = time.monotonic() + self.retry_after
+
+    def info(self):
+        age = time.monotonic() - self.fetched_at if self.fetched_at else None
+        return {
+            "url": self.url,
+            "version": self.version,
+            "ttl": self.ttl,
+            "edad": round(age, 1) if age is not None else None,
+            "etag": self.etag,
+            "error": str(self._error) if self._error else None,
+            **self.stats
+        }
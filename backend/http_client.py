@@ -0,0 +1,74 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class RateLimiter:
+    """Token bucket: `rate` requests por segundo con ráfagas de hasta `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HttpClient:
+    """
+    Cliente HTTP compartido por todo el backend: una sola sesión con
+    conexiones keep-alive, un tope global de requests simultáneos, límite de
+    tasa por host y reintentos con backoff para errores transitorios.
+    """
+
+    def __init__(self, max_concurrency=16, pool_size=32, host_rate=None,
+                 retries=2, backoff=0.3, timeout=5, headers=None):
+        self.timeout = timeout
+        self.host_rate = host_rate or {}
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+
+        retry = Retry(total=retries, connect=retries, read=retries,
+                      backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET']), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size,
+                              max_retries=retry, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def _limiter(self, host):
+        rate = self.host_rate.get(host, self.host_rate.get('*'))
+        if not rate:
+            return None
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = RateLimiter(rate)
+        return limiter
+
+    def get(self, url, headers=None, timeout=None):
+        limiter = self._limiter(urlparse(url).netloc)
+        if limiter is not None:
+            limiter.acquire()
+        with self._slots:
+            return self.session.get(url, headers=headers, timeout=timeout or self.timeout)
@@ -0,0 +1,192 @@
+import bisect
+import contextvars
+import threading
+import time
+from collections import deque
+
+
+# Límites (segundos) de los buckets de los histogramas
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    return ','.join(f'{k}="{_escape(v)}"' for k, v in pairs)
+
+
+class Histograms:
+    """
+    Histogramas acumulados por serie (tupla de pares etiqueta/valor), en
+    el formato de texto de Prometheus: buckets acumulativos, _sum y _count.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, seconds):
+        k = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[k] += 1
+            series[-1] += seconds
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self, metric, help_text):
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+        for labels, series in items:
+            prefix = _labels(labels)
+            sep = ',' if prefix else ''
+            acc = 0
+            for bound, n in zip(self.buckets + ('+Inf',), series):
+                acc += n
+                lines.append(f'{metric}_bucket{{{prefix}{sep}le="{bound}"}} {acc}')
+            lines.append(f"{metric}_sum{{{prefix}}} {series[-1]:.6f}")
+            lines.append(f"{metric}_count{{{prefix}}} {acc}")
+        return lines
+
+
+def render_gauges(metric, help_text, rows):
+    """`rows` es una lista de ({etiqueta: valor}, número)."""
+    lines = [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+    for labels, value in rows:
+        lines.append(f"{metric}{{{_labels(sorted(labels.items()))}}} {value}")
+    return lines
+
+
+SPANS = Histograms()
+REQUESTS = Histograms()
+
+_enabled = False
+# Perfil del request en curso (solo con ?profile=1); los hilos del poller no lo ven
+_profile = contextvars.ContextVar('profile', default=None)
+
+
+def configure(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled():
+    return _enabled
+
+
+class RequestProfile:
+    """Tramos de un request: (nombre, etiquetas, inicio y duración en ms)."""
+
+    __slots__ = ('id', 'ruta', 'start', 'spans', 'total_ms')
+
+    def __init__(self, profile_id, ruta):
+        self.id = profile_id
+        self.ruta = ruta
+        self.start = time.perf_counter()
+        self.spans = []
+        self.total_ms = None
+
+    def server_timing(self):
+        """Header Server-Timing con el tiempo por tipo de tramo."""
+        by_name = {}
+        for name, _, _, ms in self.spans:
+            by_name[name] = by_name.get(name, 0.0) + ms
+        parts = [f"{name};dur={ms:.3f}" for name, ms in by_name.items()]
+        parts.append(f"total;dur={self.total_ms:.3f}")
+        return ', '.join(parts)
+
+    def to_dict(self):
+        return {"id": self.id, "ruta": self.ruta, "total_ms": self.total_ms,
+                "tramos": [{"tramo": name, **dict(labels), "inicio_ms": start, "ms": ms}
+                           for name, labels, start, ms in self.spans]}
+
+
+class _Span:
+    __slots__ = ('labels', 'profile', 'start')
+
+    def __init__(self, labels, profile):
+        self.labels = labels
+        self.profile = profile
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        if _enabled:
+            SPANS.observe(self.labels, end - self.start)
+        profile = self.profile
+        if profile is not None:
+            profile.spans.append((self.labels[0][1], self.labels[1:],
+                                  round((self.start - profile.start) * 1000, 3),
+                                  round((end - self.start) * 1000, 3)))
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, **labels):
+    """
+    Mide un tramo (`with span('parse', distrito=d_id):`). Desactivado y sin
+    perfil en curso retorna un objeto compartido que no hace nada.
+    """
+    profile = _profile.get()
+    if not _enabled and profile is None:
+        return _NO_SPAN
+    if labels:
+        return _Span((('tramo', name),) + tuple(sorted((k, str(v)) for k, v in labels.items())),
+                     profile)
+    return _Span((('tramo', name),), profile)
+
+
+def observe_request(ruta, metodo, estado, seconds):
+    if _enabled:
+        REQUESTS.observe((('estado', str(estado)), ('metodo', metodo), ('ruta', ruta)), seconds)
+
+
+class ProfileLog:
+    """Últimos perfiles de requests pedidos con ?profile=1."""
+
+    def __init__(self, size=50):
+        self._profiles = deque(maxlen=size)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def start(self, ruta):
+        with self._lock:
+            self._next += 1
+            profile = RequestProfile(self._next, ruta)
+        return profile, _profile.set(profile)
+
+    def finish(self, profile, token):
+        _profile.reset(token)
+        profile.total_ms = round((time.perf_counter() - profile.start) * 1000, 3)
+        with self._lock:
+            self._profiles.append(profile)
+
+    def get(self, profile_id=None):
+        with self._lock:
+            profiles = list(self._profiles)
+        if profile_id is None:
+            return [p.to_dict() for p in profiles]
+        return next((p.to_dict() for p in profiles if p.id == profile_id), None)
@@ -0,0 +1,112 @@
+import gzip
+import hashlib
+import os
+from collections import Counter
+
+from flask import Response, jsonify, request
+
+from instrumentation import span
+from result_cache import ResultCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Bajo este tamaño no vale la pena comprimir
+MIN_COMPRESS_SIZE = 1024
+
+# Las versiones de data parten de nuevo en cada proceso: la sal evita que
+# un ETag de antes de un reinicio coincida con data distinta
+_ETAG_SALT = os.urandom(8).hex()
+
+
+def dumps(value):
+    """
+    JSON de una respuesta con orjson si está instalado (varias veces más
+    rápido). Sin orjson, o con un tipo que orjson no serializa, se usa
+    jsonify; en ambos casos las llaves van ordenadas.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+                                | orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            pass
+    return jsonify(value).get_data()
+
+
+def make_etag(slot, version):
+    raw = repr((_ETAG_SALT, slot, version)).encode('utf-8')
+    return hashlib.blake2b(raw, digest_size=12).hexdigest()
+
+
+class EncodedBody:
+    """JSON ya serializado de una respuesta, con sus versiones comprimidas."""
+
+    __slots__ = ('etag', 'encodings', 'size')
+
+    def __init__(self, etag, body, name=''):
+        self.etag = etag
+        self.encodings = {'identity': body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            with span('compresion', respuesta=name):
+                if brotli is not None:
+                    self.encodings['br'] = brotli.compress(body, quality=5)
+                self.encodings['gzip'] = gzip.compress(body, compresslevel=6)
+        self.size = sum(len(b) for b in self.encodings.values())
+
+
+class JsonResponseCache:
+    """
+    Respuestas JSON condicionales. El ETag sale del `slot` (endpoint y
+    parámetros) y de la versión de la data, así un `If-None-Match` vigente
+    se contesta con 304 sin calcular ni serializar nada. El cuerpo se
+    serializa y comprime una sola vez por versión.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024):
+        self.cache = ResultCache(max_entries, max_bytes, sizeof=lambda e: e.size)
+        self.stats = Counter()
+
+    def respond(self, slot, version, compute):
+        etag = make_etag(slot, version)
+        if request.if_none_match.contains(etag):
+            self.stats['not_modified'] += 1
+            response = Response(status=304)
+        else:
+            entry = self.cache.get_or_compute(
+                slot, version, lambda: self._encode(slot, etag, compute))
+            encoding = self._pick_encoding(entry)
+            self.stats[encoding] += 1
+            response = Response(entry.encodings[encoding], mimetype='application/json')
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    @staticmethod
+    def _encode(slot, etag, compute):
+        value = compute()
+        with span('json', respuesta=slot[0]):
+            body = dumps(value)
+        return EncodedBody(etag, body, slot[0])
+
+    @staticmethod
+    def _pick_encoding(entry):
+        accepted = request.accept_encodings
+        for encoding in ('br', 'gzip'):
+            if encoding in entry.encodings and accepted[encoding]:
+                return encoding
+        return 'identity'
+
+    def info(self):
+        return {**self.cache.info(), **{f"respuestas_{k}": v for k, v in self.stats.items()}}
@@ -0,0 +1,102 @@
+import threading
+from collections import Counter
+
+from models import DistrictBuilder, DistrictData
+
+
+class MetadataIndex:
+    """
+    dbres.json indexado por distrito: un DistrictData plantilla sin votos
+    con los candidatos (id, nombre, género, foto, sigla), sus partidos con
+    el pacto de cada uno y los pactos con su nombre. Aplicar un XML
+    (`district`) solo llena la columna de votos y suma partidos y pactos;
+    los ids de partido, las URLs de foto y los nombres se arman una vez.
+    """
+
+    def __init__(self, metadata, img_base_url):
+        self.metadata = metadata
+        self.img_base_url = img_base_url
+        self._templates = {}
+
+    def _build(self, distrito_num):
+        d_id = f"60{int(distrito_num):02d}"
+        distrito = str(int(distrito_num))
+        try:
+            pactos_ref = self.metadata.get('dbg', {})
+            dist_data = self.metadata.get('dbdp', {}).get(d_id, {})
+            district = DistrictBuilder(distrito, int(dist_data.get('q', 3)))
+
+            for c_id_raw, val in dist_data.get('c', {}).items():
+                c_id = str(c_id_raw).strip()
+
+                p_letra = val.get('g', '?')
+                p_nombre = pactos_ref.get(p_letra, f"Lista {p_letra}")
+
+                p_sigla = val.get('p', 'IND')
+                c_cupo = val.get('c')
+                sigla_math = c_cupo if c_cupo else (
+                    f"IND_{c_id}" if p_sigla == "IND" else p_sigla)
+                pid = f"{p_letra}-{sigla_math}"
+
+                id_foto = val.get('t')
+                foto = f"{self.img_base_url}{id_foto}.jpg" if id_foto else ""
+
+                district.add(c_id, val.get('n', ''), p_letra, p_nombre,
+                             pid, sigla_math.replace(f"IND_{c_id}", "IND"), 0.0,
+                             val.get('s', 'N/A'), foto, p_sigla)
+            return district.build()
+        except Exception:
+            # Metadata del distrito mal formada: distrito vacío, como antes
+            return DistrictData(distrito, 3)
+
+    def template(self, distrito_num):
+        """DistrictData del distrito con votos en 0, armado al primer uso."""
+        key = int(distrito_num)
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates.setdefault(key, self._build(key))
+        return template
+
+    def district(self, distrito_num, votos_map, total_votos_xml):
+        """
+        DistrictData con los votos de un XML: `votos_map` es {id: votos}
+        (dict o ResultCounts) y los porcentajes van sobre el total del XML
+        o, si no trae, sobre la suma de los candidatos.
+        """
+        template = self.template(distrito_num)
+        votes = [votos_map.get(c_id, 0) for c_id in template.cand_id]
+        base = total_votos_xml if total_votos_xml > 0 else sum(votes)
+        return template.with_votes(votes, base)
+
+    def candidate_pacts(self, distrito_num):
+        """{id de candidato: pacto} del distrito."""
+        template = self.template(distrito_num)
+        return {int(c_id): template.pact_of(i) for i, c_id in enumerate(template.cand_id)
+                if c_id.isdigit()}
+
+
+class MetadataIndexCache:
+    """
+    Último MetadataIndex armado. CachedResource entrega el mismo objeto
+    mientras dbres.json no cambia, así que el índice se rearma solo cuando
+    llega una versión nueva.
+    """
+
+    def __init__(self, img_base_url):
+        self.img_base_url = img_base_url
+        self.stats = Counter()
+        self._index = None
+        self._lock = threading.Lock()
+
+    def get(self, metadata):
+        with self._lock:
+            if self._index is None or self._index.metadata is not metadata:
+                self._index = MetadataIndex(metadata, self.img_base_url)
+                self.stats['builds'] += 1
+            else:
+                self.stats['hits'] += 1
+            return self._index
+
+    def info(self):
+        index = self._index
+        return {"distritos": len(index._templates) if index else 0, **self.stats}
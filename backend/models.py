@@ -0,0 +1,278 @@
+import sys
+from array import array
+from collections.abc import Sequence
+
+from dhondt import iter_dhondt, seats_by_list
+
+
+CANDIDATE_FIELDS = ('_id', 'name', 'party_id', 'votes', 'gender', 'percentage',
+                    'photo_url', 'display_party', 'pact_id', 'distrito_num')
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _percentages(votes, percent_base):
+    if percent_base:
+        return array('d', (round((v / percent_base) * 100, 2) for v in votes))
+    return array('d', bytes(8 * len(votes)))
+
+
+class DistrictData:
+    """
+    Data de un distrito en columnas: candidatos, partidos y pactos como
+    tuplas de strings internados y arrays de votos, con el partido de cada
+    candidato y el pacto de cada partido como códigos enteros. Los dicts
+    de la API se arman solo al responder (`to_payload`, `candidate`).
+
+    Un escenario es una vista (`with_pacts`) que comparte las columnas de
+    candidatos y partidos y solo trae sus propios pactos fusionados.
+    """
+
+    __slots__ = ('distrito', 'seats',
+                 'cand_id', 'cand_name', 'cand_party', 'cand_votes', 'cand_pct',
+                 'cand_gender', 'cand_photo', 'cand_display',
+                 'party_id', 'party_name', 'party_list', 'party_pact', 'party_votes',
+                 'pact_id', 'pact_name', 'pact_votes', 'pact_map', 'pct_zero')
+
+    def __init__(self, distrito, seats, **columns):
+        self.distrito = distrito
+        self.seats = seats
+        self.cand_id = self.cand_name = self.cand_gender = ()
+        self.cand_photo = self.cand_display = ()
+        self.cand_party, self.cand_votes, self.cand_pct = array('i'), array('d'), array('d')
+        self.party_id = self.party_name = self.party_list = ()
+        self.party_pact, self.party_votes = array('i'), array('d')
+        self.pact_id = self.pact_name = ()
+        self.pact_votes = array('d')
+        self.pact_map = None
+        # Sin votos contados el porcentaje se informa como 0 entero
+        self.pct_zero = False
+        for name, value in columns.items():
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return (f"DistrictData(distrito={self.distrito!r}, candidatos={len(self.cand_id)}, "
+                f"pactos={len(self.pact_id)})")
+
+    @property
+    def has_candidates(self):
+        return bool(self.cand_id)
+
+    @property
+    def nbytes(self):
+        """
+        Memoria aproximada de las columnas, para el límite de RESULT_CACHE.
+        Una vista de escenario cuenta también las columnas que comparte con
+        la base: el límite queda por el lado seguro.
+        """
+        total = 0
+        for name in _COLUMNS:
+            col = getattr(self, name)
+            if isinstance(col, array):
+                total += col.itemsize * len(col)
+            else:
+                # Strings como su largo más la cabecera de un str vacío
+                total += sys.getsizeof(col) + len(col) * _STR_SIZE + sum(map(len, col))
+        return total
+
+    def pact_of_party(self, q):
+        lid = self.party_list[q]
+        return self.pact_map.get(lid, lid) if self.pact_map else lid
+
+    def pact_of(self, i):
+        return self.pact_of_party(self.cand_party[i])
+
+    def percentage(self, i):
+        return 0 if self.pct_zero else self.cand_pct[i]
+
+    def party_sizes(self):
+        sizes = [0] * len(self.party_id)
+        for q in self.cand_party:
+            sizes[q] += 1
+        return sizes
+
+    def with_pacts(self, pact_id, pact_name, pact_votes, pact_map):
+        """Vista con otra lista de pactos; `pact_map` lleva cada pacto original al fusionado."""
+        view = DistrictData.__new__(DistrictData)
+        for name in DistrictData.__slots__:
+            setattr(view, name, getattr(self, name))
+        view.pact_id = tuple(_intern(p) for p in pact_id)
+        view.pact_name = tuple(pact_name)
+        view.pact_votes = array('d', pact_votes)
+        view.pact_map = pact_map
+        pos = {pid: k for k, pid in enumerate(view.pact_id)}
+        view.party_pact = array('i', (pos.get(view.pact_of_party(q), -1)
+                                      for q in range(len(self.party_id))))
+        return view
+
+    def with_votes(self, votes, percent_base=None):
+        """
+        Copia con otros votos por candidato (en el orden de cand_id): suma
+        los de partidos y pactos y recalcula porcentajes como
+        DistrictBuilder.build. Comparte las columnas de texto; es para la
+        data base, no para una vista de escenario.
+        """
+        data = DistrictData.__new__(DistrictData)
+        for name in DistrictData.__slots__:
+            setattr(data, name, getattr(self, name))
+        data.cand_votes = array('d', votes)
+        data.party_votes = array('d', bytes(8 * len(self.party_id)))
+        data.pact_votes = array('d', bytes(8 * len(self.pact_id)))
+        party_pact = self.party_pact
+        for q, v in zip(self.cand_party, data.cand_votes):
+            data.party_votes[q] += v
+            data.pact_votes[party_pact[q]] += v
+        data.cand_pct = _percentages(data.cand_votes, percent_base)
+        data.pct_zero = percent_base is not None and not percent_base > 0
+        return data
+
+    def elect(self):
+        """
+        Índices de los electos con las mismas reglas y el mismo orden que
+        calculate_dhondt: escaños por pacto, luego por partido dentro del
+        pacto con tope de candidatos, y al final ordenados por votos.
+        """
+        votes = self.cand_votes
+        by_party = [[] for _ in self.party_id]
+        for i, q in enumerate(self.cand_party):
+            by_party[q].append(i)
+        for members in by_party:
+            members.sort(key=votes.__getitem__, reverse=True)
+
+        members_of = [[] for _ in self.pact_id]
+        for q, p in enumerate(self.party_pact):
+            if p >= 0:
+                members_of[p].append(q)
+
+        elected, elected_ids = [], set()
+        for p, seats_won in seats_by_list(self.pact_votes, self.seats).items():
+            members = members_of[p]
+            taken = [0] * len(members)
+            assigned = 0
+            for k in iter_dhondt([self.party_votes[q] for q in members],
+                                 [len(by_party[q]) for q in members]):
+                if assigned >= seats_won:
+                    break
+                i = by_party[members[k]][taken[k]]
+                taken[k] += 1
+                if self.cand_id[i] not in elected_ids:
+                    elected_ids.add(self.cand_id[i])
+                    elected.append(i)
+                    assigned += 1
+
+        elected.sort(key=votes.__getitem__, reverse=True)
+        return tuple(elected)
+
+    def candidate(self, i):
+        q = self.cand_party[i]
+        return dict(zip(CANDIDATE_FIELDS, (
+            self.cand_id[i], self.cand_name[i], self.party_id[q], self.cand_votes[i],
+            self.cand_gender[i], self.percentage(i), self.cand_photo[i],
+            self.cand_display[i], self.pact_of_party(q), self.distrito)))
+
+    def candidates_payload(self, indices=None):
+        if indices is None:
+            indices = range(len(self.cand_id))
+        return [self.candidate(i) for i in indices]
+
+    def candidate_rows(self):
+        return CandidateRows(self)
+
+    def parties_payload(self):
+        return [{"_id": pid, "name": name, "list_id": lid, "votes": v}
+                for pid, name, lid, v in zip(self.party_id, self.party_name,
+                                             self.party_list, self.party_votes)]
+
+    def pacts_payload(self):
+        return [{"_id": pid, "name": name, "votes": v}
+                for pid, name, v in zip(self.pact_id, self.pact_name, self.pact_votes)]
+
+    def to_payload(self):
+        return {
+            "candidates": self.candidates_payload(),
+            "parties": self.parties_payload(),
+            "pacts": self.pacts_payload(),
+            "seats": self.seats
+        }
+
+
+# Columnas de DistrictData que cuenta `nbytes`: arrays y tuplas de strings
+_STR_SIZE = sys.getsizeof('')
+_COLUMNS = tuple(name for name in DistrictData.__slots__
+                 if name.startswith(('cand_', 'party_', 'pact_')) and name != 'pact_map')
+
+
+class CandidateRows(Sequence):
+    """Secuencia de candidatos como dicts, armados recién al accederlos."""
+
+    __slots__ = ('district',)
+
+    def __init__(self, district):
+        self.district = district
+
+    def __len__(self):
+        return len(self.district.cand_id)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.district.candidate(k) for k in range(len(self))[i]]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.district.candidate(i)
+
+
+class DistrictBuilder:
+    """Arma un DistrictData candidato por candidato, sumando votos por partido y pacto."""
+
+    def __init__(self, distrito, seats):
+        self.distrito = distrito
+        self.seats = seats
+        self.cands = []
+        self.cand_party, self.cand_votes = array('i'), array('d')
+        self.parties, self.party_pact, self.party_votes = [], array('i'), array('d')
+        self.pacts, self.pact_votes = [], array('d')
+        self._party_pos, self._pact_pos = {}, {}
+
+    def add(self, cand_id, name, pact, pact_name, party, party_name, votes,
+            gender, photo, display):
+        p = self._pact_pos.get(pact)
+        if p is None:
+            p = self._pact_pos[pact] = len(self.pacts)
+            self.pacts.append((_intern(pact), pact_name))
+            self.pact_votes.append(0.0)
+        self.pact_votes[p] += votes
+
+        q = self._party_pos.get(party)
+        if q is None:
+            q = self._party_pos[party] = len(self.parties)
+            self.parties.append((_intern(party), party_name, _intern(pact)))
+            self.party_pact.append(p)
+            self.party_votes.append(0.0)
+        self.party_votes[q] += votes
+
+        self.cands.append((cand_id, name, _intern(gender), photo, _intern(display)))
+        self.cand_party.append(q)
+        self.cand_votes.append(votes)
+
+    def build(self, percent_base=None):
+        """
+        `percent_base` es el total para los porcentajes: None los deja en
+        0.0 y un total sin votos los informa como 0.
+        """
+        ids, names, genders, photos, displays = zip(*self.cands) if self.cands else ((),) * 5
+        pct = _percentages(self.cand_votes, percent_base)
+        party_cols = list(zip(*self.parties)) or [(), (), ()]
+        pact_cols = list(zip(*self.pacts)) or [(), ()]
+        return DistrictData(
+            self.distrito, self.seats,
+            cand_id=ids, cand_name=names, cand_party=self.cand_party,
+            cand_votes=self.cand_votes, cand_pct=pct, cand_gender=genders,
+            cand_photo=photos, cand_display=displays,
+            party_id=party_cols[0], party_name=party_cols[1], party_list=party_cols[2],
+            party_pact=self.party_pact, party_votes=self.party_votes,
+            pact_id=pact_cols[0], pact_name=pact_cols[1], pact_votes=self.pact_votes,
+            pct_zero=percent_base is not None and not percent_base > 0)
@@ -0,0 +1,114 @@
+from collections import defaultdict
+
+import numpy as np
+
+from dhondt_batch import DistrictTables, dhondt_batch
+
+
+# Máximo de escenarios por bloque dentro de un distrito (acota la memoria)
+CHUNK_SIZE = 20000
+
+
+def simulate_district(district, draws, concentration, seed):
+    """
+    Simula `draws` resultados del distrito muestreando los porcentajes de
+    los candidatos con una Dirichlet centrada en la encuesta
+    (alpha = concentración * porcentaje). Los candidatos sin votos en la
+    encuesta se mantienen en cero.
+
+    Retorna las veces que salió electo cada candidato y los escaños por
+    pacto en cada escenario (escenarios x pactos).
+    """
+    tables = DistrictTables.from_district(district)
+    rng = np.random.default_rng(seed)
+
+    base = tables.cand_votes
+    active = np.flatnonzero(base > 0)
+    total = base[active].sum()
+
+    elected_count = np.zeros(len(base), dtype=np.int64)
+    pact_seats = np.zeros((draws, len(tables.pact_ids)), dtype=np.int16)
+    if len(active) == 0:
+        return district.distrito, tables.pact_ids, elected_count, pact_seats
+
+    alpha = concentration * base[active] / total
+    for start in range(0, draws, CHUNK_SIZE):
+        n = min(CHUNK_SIZE, draws - start)
+        cand_votes = np.zeros((n, len(base)))
+        cand_votes[:, active] = rng.dirichlet(alpha, size=n) * total
+        pact_votes, party_votes = tables.aggregate(cand_votes)
+
+        res = dhondt_batch(tables, pact_votes, party_votes,
+                           district.seats, cand_votes=cand_votes)
+        elected_count += res.elected.sum(axis=0)
+        pact_seats[start:start + n] = res.pact_seats
+
+    return district.distrito, tables.pact_ids, elected_count, pact_seats
+
+
+def run_montecarlo(districts, draws, concentration, seed, executor=None):
+    """
+    Corre la simulación para todos los distritos (en paralelo si se entrega
+    un executor). Cada distrito usa su propia semilla derivada de `seed`,
+    así el resultado no depende del orden en que terminen los procesos.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(len(districts))
+    args = [(d, draws, concentration, s) for d, s in zip(districts, seeds)]
+    if executor is None:
+        results = [simulate_district(*a) for a in args]
+    else:
+        results = list(executor.map(simulate_district, *zip(*args)))
+
+    by_district = {d.distrito: d for d in districts}
+    national = defaultdict(lambda: np.zeros(draws, dtype=np.int64))
+    pact_names = {}
+    out_candidates, out_districts = [], []
+
+    for distrito, pact_ids, elected_count, pact_seats in results:
+        data = by_district[distrito]
+        names = dict(zip(data.pact_id, data.pact_name))
+        pact_names.update(names)
+
+        for i in np.flatnonzero(elected_count):
+            q = data.cand_party[i]
+            out_candidates.append({
+                "_id": data.cand_id[i],
+                "name": data.cand_name[i],
+                "distrito": distrito,
+                "pact_id": data.pact_of_party(q),
+                "party_id": data.party_id[q],
+                "votes": data.cand_votes[i],
+                "prob_electo": round(elected_count[i] / draws, 4)
+            })
+
+        pactos = []
+        for j, pid in enumerate(pact_ids):
+            seats = pact_seats[:, j]
+            national[pid] += seats
+            values, counts = np.unique(seats, return_counts=True)
+            pactos.append({
+                "id": pid,
+                "name": names.get(pid, pid),
+                "media": round(float(seats.mean()), 3),
+                "distribucion": {str(int(v)): round(c / draws, 4)
+                                 for v, c in zip(values, counts)}
+            })
+        out_districts.append({"distrito": distrito, "seats": data.seats,
+                              "pactos": pactos})
+
+    out_national = []
+    for pid, seats in national.items():
+        p5, p50, p95 = np.percentile(seats, [5, 50, 95])
+        out_national.append({
+            "id": pid,
+            "name": pact_names.get(pid, pid),
+            "media": round(float(seats.mean()), 2),
+            "p5": int(p5), "p50": int(p50), "p95": int(p95),
+            "min": int(seats.min()), "max": int(seats.max())
+        })
+    out_national.sort(key=lambda x: x['media'], reverse=True)
+
+    out_candidates.sort(key=lambda c: (int(c['distrito']), -c['prob_electo']))
+    out_districts.sort(key=lambda d: int(d['distrito']))
+    return {"candidatos": out_candidates, "distritos": out_districts,
+            "nacional": out_national}
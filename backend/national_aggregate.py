@@ -0,0 +1,135 @@
+import threading
+from collections import defaultdict
+
+
+OTHER_RANK = 99
+
+
+class NationalAggregate:
+    """
+    Hemiciclo nacional armado por aportes de distrito. Cada distrito guarda
+    su aporte (votos y escaños por pacto, electos agrupados por orden de
+    pacto); al cambiar un distrito se resta su aporte anterior y se suma el
+    nuevo, sin recorrer los demás. `summary()` arma la misma respuesta que
+    build_national_summary recorriendo solo los totales por pacto.
+    """
+
+    def __init__(self, pact_order, main_pacts, overlay=None, escenario=''):
+        self.rank = {}
+        for pid in pact_order:
+            self.rank.setdefault(pid, len(self.rank))
+        if overlay:
+            for pid in overlay.names:
+                self.rank.setdefault(pid, len(self.rank))
+        self.main_pacts = set(main_pacts)
+        self.overlay = overlay
+        self.escenario = escenario
+
+        self.votes = defaultdict(float)
+        self.seats = defaultdict(int)
+        self.names = {}
+        self.total = 0
+        # pacto -> {distrito: posición del pacto en ese distrito}
+        self.present = defaultdict(dict)
+        # orden del pacto -> {distrito: electos}
+        self.by_rank = defaultdict(dict)
+        self._contrib = {}
+        self._sources = {}
+        self._lock = threading.Lock()
+
+    def _is_scenario(self, pid):
+        return pid.startswith("SC_") or bool(self.overlay and self.overlay.is_merged(pid))
+
+    def _is_absorbed(self, pid):
+        return bool(self.overlay and self.overlay.is_absorbed(pid))
+
+    def _apply(self, distrito, contrib, sign):
+        votes, seats, ranks = contrib
+        for pid, v in votes.items():
+            self.votes[pid] += sign * v
+        for pid, n in seats.items():
+            self.seats[pid] += sign * n
+            self.total += sign * n
+        for rank, people in ranks.items():
+            if sign > 0:
+                self.by_rank[rank][distrito] = people
+            else:
+                del self.by_rank[rank][distrito]
+
+    def is_current(self, distrito, source):
+        """True si el aporte de `distrito` ya corresponde a `source`."""
+        with self._lock:
+            return self._sources.get(distrito) is source
+
+    def update(self, distrito, elected, pacts, source=None):
+        """
+        Reemplaza el aporte de `distrito`. Si `source` es el mismo objeto de
+        la última actualización el distrito no cambió y no se toca nada.
+        """
+        with self._lock:
+            if source is not None and self._sources.get(distrito) is source:
+                return False
+
+            votes, seats, ranks = {}, defaultdict(int), defaultdict(list)
+            for p in pacts:
+                votes[p['_id']] = votes.get(p['_id'], 0) + p['votes']
+                if not self.names.get(p['_id']):
+                    self.names[p['_id']] = p['name']
+            for c in elected:
+                seats[c['pact_id']] += 1
+                ranks[self.rank.get(c['pact_id'], OTHER_RANK)].append(c)
+
+            old = self._contrib.pop(distrito, None)
+            if old is not None:
+                self._apply(distrito, old, -1)
+                for pid in old[0]:
+                    self.present[pid].pop(distrito, None)
+
+            contrib = (votes, dict(seats), dict(ranks))
+            self._apply(distrito, contrib, 1)
+            for pos, pid in enumerate(votes):
+                self.present[pid][distrito] = pos
+            self._contrib[distrito] = contrib
+            self._sources[distrito] = source
+            return True
+
+    def summary(self):
+        with self._lock:
+            diputados = []
+            for rank in sorted(self.by_rank):
+                per_district = self.by_rank[rank]
+                for distrito in sorted(per_district, key=int):
+                    diputados.extend(per_district[distrito])
+
+            # Mismo orden de aparición que recorrer los distritos en orden
+            pids = sorted((pid for pid, where in self.present.items() if where),
+                          key=lambda pid: min((int(d), pos) for d, pos in self.present[pid].items()))
+
+            resumen = []
+            otros_acc = {'id': 'others', 'name': 'Otros Partidos',
+                         'votes': 0, 'seats': 0, 'color_key': 'default'}
+            for pid in pids:
+                if self.votes[pid] <= 0:
+                    continue
+                if self._is_scenario(pid) or (pid in self.main_pacts and not self._is_absorbed(pid)):
+                    resumen.append({
+                        "id": pid,
+                        "name": self.names[pid],
+                        "votes": self.votes[pid],
+                        "seats": self.seats[pid],
+                        "color_key": self.overlay.color_key(pid) if self.overlay else pid
+                    })
+                elif pid not in self.main_pacts and not self._is_absorbed(pid):
+                    otros_acc['votes'] += self.votes[pid]
+                    otros_acc['seats'] += self.seats[pid]
+
+            if otros_acc['votes'] > 0:
+                resumen.append(otros_acc)
+            resumen.sort(key=lambda x: x['seats'], reverse=True)
+
+            return {
+                "total": self.total,
+                "diputados": diputados,
+                "resumen": resumen,
+                "escenario_activo": self.escenario
+            }
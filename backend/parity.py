@@ -0,0 +1,163 @@
+import sys
+
+
+GENDERS = ('H', 'M')
+
+
+def _slot(gender, is_elected):
+    # Conteos como [candidatos H, candidatos M, electos H, electos M]
+    return (gender == 'M') + 2 * is_elected
+
+
+class DistrictParity:
+    """
+    Conteos H/M de candidatos y electos de un distrito, en total, por
+    pacto y por partido. Se arma una vez por versión del distrito (el
+    poller lo guarda en su snapshot); el reporte nacional solo suma estos
+    conteos, sin volver a recorrer candidatos.
+    """
+
+    __slots__ = ('distrito', 'seats', 'total', 'pacts', 'parties', 'pact_names', 'party_info')
+
+    def __init__(self, data, elected):
+        self.distrito = data.distrito
+        self.seats = data.seats
+        self.total = [0, 0, 0, 0]
+        self.pacts, self.parties = {}, {}
+        self.pact_names = dict(zip(data.pact_id, data.pact_name))
+        # partido -> (nombre, pacto)
+        self.party_info = {}
+        elected = set(elected)
+        for i, q in enumerate(data.cand_party):
+            gender = data.cand_gender[i]
+            if gender not in GENDERS:
+                continue
+            pid, pact = data.party_id[q], data.pact_of_party(q)
+            if pid not in self.party_info:
+                self.party_info[pid] = (data.party_name[q], pact)
+            for counts in (self.total,
+                           self.pacts.setdefault(pact, [0, 0, 0, 0]),
+                           self.parties.setdefault(pid, [0, 0, 0, 0])):
+                counts[_slot(gender, False)] += 1
+                if i in elected:
+                    counts[_slot(gender, True)] += 1
+
+    @property
+    def nbytes(self):
+        """Memoria aproximada de los conteos y nombres, para el límite de RESULT_CACHE."""
+        groups = 1 + len(self.pacts) + len(self.parties)
+        names = [*self.pact_names.values(), *(name for name, _ in self.party_info.values())]
+        return (groups * sys.getsizeof([0, 0, 0, 0])
+                + sum(map(sys.getsizeof, (self.pacts, self.parties,
+                                          self.pact_names, self.party_info)))
+                + sum(map(sys.getsizeof, names)))
+
+    def genero(self):
+        """Totales con la forma de DistrictSnapshot.genero."""
+        h, m, eh, em = self.total
+        return {"candidatos": {"h": h, "m": m, "t": h + m},
+                "electos": {"h": eh, "m": em, "t": eh + em}}
+
+
+def parity_correction(data, elected):
+    """
+    Aplica la regla de corrección de paridad a los electos de un distrito.
+    El distrito queda paritario si la diferencia entre hombres y mujeres
+    electos es a lo más 1 con escaños impares y 0 con pares. Mientras no
+    lo sea, el electo menos votado del género sobrerrepresentado cede su
+    escaño al no electo más votado del otro género de su mismo partido o,
+    si no hay, de su mismo pacto; si tampoco hay, se pasa al siguiente
+    menos votado. Así la corrección no cambia los escaños de cada pacto.
+
+    Retorna (índices de electos corregidos, [(sale, entra)]).
+    """
+    genders = data.cand_gender
+    votes = data.cand_votes
+    chosen = list(elected)
+    taken = set(chosen)
+    h = sum(1 for i in chosen if genders[i] == 'H')
+    m = sum(1 for i in chosen if genders[i] == 'M')
+    if abs(h - m) <= (h + m) % 2:
+        return tuple(chosen), []
+
+    over, under = ('H', 'M') if h > m else ('M', 'H')
+    # Reemplazantes del género subrepresentado, del más votado al menos votado
+    pool = sorted((i for i in range(len(data.cand_id))
+                   if genders[i] == under and i not in taken),
+                  key=votes.__getitem__, reverse=True)
+    replacements = []
+    for i in sorted((i for i in chosen if genders[i] == over), key=votes.__getitem__):
+        if abs(h - m) <= (h + m) % 2:
+            break
+        q = data.cand_party[i]
+        j = next((j for j in pool if data.cand_party[j] == q), None)
+        if j is None:
+            pact = data.pact_of_party(q)
+            j = next((j for j in pool if data.pact_of(j) == pact), None)
+        if j is None:
+            continue
+        pool.remove(j)
+        chosen[chosen.index(i)] = j
+        replacements.append((i, j))
+        h, m = (h - 1, m + 1) if over == 'H' else (h + 1, m - 1)
+
+    chosen.sort(key=votes.__getitem__, reverse=True)
+    return tuple(chosen), replacements
+
+
+def _counts(counts, incentive_per_woman):
+    h, m, eh, em = counts
+    return {
+        "candidatos": {"hombres": h, "mujeres": m, "total": h + m},
+        "electos": {"hombres": eh, "mujeres": em, "total": eh + em},
+        "incentivo": em * incentive_per_woman
+    }
+
+
+def _add(total, counts):
+    for k, v in enumerate(counts):
+        total[k] += v
+
+
+def parity_report(parities, incentive_per_woman, distrito=None):
+    """
+    Reporte desde los DistrictParity de cada distrito: totales, pactos y
+    partidos del país (o solo de `distrito`) con el incentivo por mujer
+    electa, y el resumen de cada distrito.
+    """
+    total, pacts, parties = [0, 0, 0, 0], {}, {}
+    pact_names, party_info = {}, {}
+    distritos = []
+    for p in sorted(parities, key=lambda p: int(p.distrito)):
+        eh, em = p.total[2:]
+        distritos.append({"distrito": p.distrito, "escanos": p.seats,
+                          "paritario": abs(eh - em) <= (eh + em) % 2,
+                          **_counts(p.total, incentive_per_woman)})
+        if distrito is not None and p.distrito != distrito:
+            continue
+        _add(total, p.total)
+        for pact, counts in p.pacts.items():
+            _add(pacts.setdefault(pact, [0, 0, 0, 0]), counts)
+            pact_names.setdefault(pact, p.pact_names.get(pact, pact))
+        for pid, counts in p.parties.items():
+            _add(parties.setdefault(pid, [0, 0, 0, 0]), counts)
+            party_info.setdefault(pid, p.party_info[pid])
+
+    def ranked(groups):
+        # Más electas primero, luego más electos
+        return sorted(groups.items(), key=lambda kv: (-kv[1][3], -(kv[1][2] + kv[1][3]), kv[0]))
+
+    electos = total[2] + total[3]
+    return {
+        "incentivo_por_mujer": incentive_per_woman,
+        "distrito": distrito,
+        "totales": {**_counts(total, incentive_per_woman),
+                     "porcentaje_mujeres_electas":
+                         round(total[3] / electos * 100, 2) if electos else 0},
+        "pactos": [{"id": pact, "nombre": pact_names[pact], **_counts(c, incentive_per_woman)}
+                   for pact, c in ranked(pacts)],
+        "partidos": [{"id": pid, "nombre": party_info[pid][0], "pacto": party_info[pid][1],
+                      **_counts(c, incentive_per_woman)}
+                     for pid, c in ranked(parties)],
+        "distritos": distritos
+    }
@@ -0,0 +1,129 @@
+import bisect
+import heapq
+import sys
+from itertools import islice
+
+
+ARRASTRADOS, CORTADOS = 'arrastrados', 'cortados'
+
+
+class _Ordering:
+    """Candidatos de un distrito ordenados, con la clave de orden en una lista paralela."""
+
+    __slots__ = ('keys', 'indices')
+
+    def __init__(self, keys, indices):
+        self.keys = keys
+        self.indices = indices
+
+
+_EMPTY = _Ordering([], [])
+
+
+class PhenomenaIndex:
+    """
+    Arrastrados (electos con menos votos) y cortados (no electos con más
+    votos) del país sin ordenar todos los candidatos en cada consulta.
+
+    Por distrito se guardan los electos por votos ascendentes y los no
+    electos por votos descendentes; el top-k nacional es un heapq.merge de
+    esas listas que se corta en cuanto hay k filas. Cada elemento es
+    (clave, posición del distrito, índice), así los empates quedan en el
+    mismo orden que un sort estable de la lista nacional.
+
+    Los filtros por pacto y género usan sublistas del distrito armadas al
+    primer uso; solo se guardan para pactos y géneros que existen en el
+    índice, así valores arbitrarios del request no lo hacen crecer. El
+    umbral relativo a la cuota (votos válidos / escaños) es un corte por
+    bisección: dentro de un distrito la razón votos / cuota crece con los
+    votos.
+    """
+
+    def __init__(self, districts):
+        self.districts = []
+        self.total_electos = 0
+        self.pacts, self.genders = set(), set()
+        self._orders = {}
+        for pos, (d_id, res, elected) in enumerate(districts):
+            elected_ids = set(res.cand_id[i] for i in elected)
+            votes = res.cand_votes
+            electos, no_electos = [], []
+            for i, cand_id in enumerate(res.cand_id):
+                (electos if cand_id in elected_ids else no_electos).append(i)
+            self.total_electos += len(electos)
+
+            # sort estable también con reverse: los empates quedan por índice
+            electos.sort(key=votes.__getitem__)
+            no_electos.sort(key=votes.__getitem__, reverse=True)
+            self._orders[(pos, ARRASTRADOS, None, None)] = _Ordering(
+                [votes[i] for i in electos], electos)
+            self._orders[(pos, CORTADOS, None, None)] = _Ordering(
+                [-votes[i] for i in no_electos], no_electos)
+
+            self.pacts.update(res.pact_of_party(q) for q in range(len(res.party_id)))
+            self.genders.update(res.cand_gender)
+
+            valid = sum(votes)
+            quota = valid / res.seats if valid > 0 and res.seats > 0 else 0.0
+            self.districts.append((d_id, res, quota, dict(zip(res.pact_id, res.pact_name))))
+
+    @property
+    def nbytes(self):
+        """Memoria aproximada: la data de cada distrito y sus ordenamientos."""
+        # Una clave float más un puntero por elemento de cada lista
+        per_entry = sys.getsizeof(0.0) + 2 * 8
+        return (sum(res.nbytes for _, res, _, _ in self.districts)
+                + sum(per_entry * len(o.keys) for o in self._orders.values()))
+
+    def _ordering(self, pos, kind, pacto, genero):
+        if (pacto is not None and pacto not in self.pacts
+                or genero is not None and genero not in self.genders):
+            return _EMPTY
+        key = (pos, kind, pacto, genero)
+        ordering = self._orders.get(key)
+        if ordering is None:
+            base = self._orders[(pos, kind, None, None)]
+            res = self.districts[pos][1]
+            keep = [k for k, i in enumerate(base.indices)
+                    if (pacto is None or res.pact_of(i) == pacto)
+                    and (genero is None or res.cand_gender[i] == genero)]
+            ordering = self._orders.setdefault(key, _Ordering(
+                [base.keys[k] for k in keep], [base.indices[k] for k in keep]))
+        return ordering
+
+    def _entries(self, pos, kind, pacto, genero, cuota_min, cuota_max):
+        ordering = self._ordering(pos, kind, pacto, genero)
+        lo, hi = 0, len(ordering.keys)
+        if cuota_min is not None or cuota_max is not None:
+            quota = self.districts[pos][2]
+            low = cuota_min * quota if cuota_min is not None else float('-inf')
+            high = cuota_max * quota if cuota_max is not None else float('inf')
+            # Las claves de los cortados son votos negativos
+            if kind == CORTADOS:
+                low, high = -high, -low
+            lo = bisect.bisect_left(ordering.keys, low)
+            hi = bisect.bisect_right(ordering.keys, high)
+        keys, indices = ordering.keys, ordering.indices
+        return ((keys[k], pos, indices[k]) for k in range(lo, hi))
+
+    def row(self, pos, i, is_elected):
+        d_id, res, quota, pact_names = self.districts[pos]
+        cand = res.candidate(i)
+        cand['is_elected'] = is_elected
+        cand['distrito'] = d_id
+        cand['pact_name'] = pact_names.get(cand['pact_id'], cand['pact_id'])
+        return cand
+
+    def top(self, kind, limit, offset=0, distrito=None, pacto=None, genero=None,
+            cuota_min=None, cuota_max=None):
+        """
+        (filas, hay_más) de `kind` desde la posición `offset`. Lee a lo más
+        offset + limit + 1 elementos del merge.
+        """
+        positions = [pos for pos, d in enumerate(self.districts)
+                     if distrito is None or d[0] == distrito]
+        merged = heapq.merge(*(self._entries(pos, kind, pacto, genero, cuota_min, cuota_max)
+                               for pos in positions))
+        page = list(islice(merged, offset, offset + limit + 1))
+        rows = [self.row(pos, i, kind == ARRASTRADOS) for _, pos, i in page[:limit]]
+        return rows, len(page) > limit
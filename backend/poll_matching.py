@@ -0,0 +1,159 @@
+import difflib
+import hashlib
+import json
+import threading
+import unicodedata
+from collections import defaultdict
+
+
+MATCH_CUTOFF = 0.8
+# Dos nombres de la encuesta a menos de esta distancia se reportan como ambiguos
+AMBIGUITY_MARGIN = 0.05
+
+
+def normalize_string_aggressive(s):
+    if not isinstance(s, str):
+        return ""
+    s = ''.join(c for c in unicodedata.normalize(
+        'NFD', s) if unicodedata.category(c) != 'Mn')
+    return s.lower().strip()
+
+
+def poll_fingerprint(poll_data):
+    raw = json.dumps(poll_data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _trigrams(s):
+    s = f"  {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class _DistrictPoll:
+    """Nombres normalizados de la encuesta de un distrito + índice de trigramas."""
+
+    def __init__(self, entries):
+        # Igual que el dict original: ante nombres repetidos gana el último
+        self.votes = {}
+        self.names = {}
+        for e in entries:
+            key = normalize_string_aggressive(e.get('nombre'))
+            self.votes[key] = e.get('votos', 0)
+            self.names[key] = e.get('nombre')
+
+        self.grams = defaultdict(set)
+        for key in self.votes:
+            for g in _trigrams(key):
+                self.grams[g].add(key)
+
+    def candidates_for(self, name):
+        shared = set()
+        for g in _trigrams(name):
+            shared |= self.grams.get(g, set())
+        return shared or self.votes.keys()
+
+    def match(self, name):
+        """
+        Retorna (clave, score, alternativas). Primero busca la clave exacta;
+        si no existe, puntúa solo los nombres que comparten trigramas con
+        el mismo criterio de difflib.get_close_matches.
+        """
+        if name in self.votes:
+            return name, 1.0, []
+
+        sm = difflib.SequenceMatcher()
+        sm.set_seq2(name)
+        scored = []
+        for key in self.candidates_for(name):
+            sm.set_seq1(key)
+            if sm.real_quick_ratio() >= MATCH_CUTOFF and \
+                    sm.quick_ratio() >= MATCH_CUTOFF:
+                score = sm.ratio()
+                if score >= MATCH_CUTOFF:
+                    scored.append((score, key))
+
+        if not scored:
+            return None, 0.0, []
+        scored.sort(reverse=True)
+        best_score, best = scored[0]
+        rivals = [k for s, k in scored[1:] if best_score - s < AMBIGUITY_MARGIN]
+        return best, best_score, rivals
+
+
+class PollMatchIndex:
+    """
+    Cruce nombre de candidato -> votos de encuesta, construido una vez por
+    snapshot de la encuesta. Los resultados por distrito se memorizan y solo
+    se descartan al reemplazar el índice (nueva encuesta).
+    """
+
+    def __init__(self, poll_data):
+        self.fingerprint = poll_fingerprint(poll_data)
+        self._polls = {k: _DistrictPoll(v) for k, v in poll_data.items()
+                       if isinstance(v, list)}
+        self._memo = {}
+        self._details = {}
+        self._lock = threading.Lock()
+
+    def match_district(self, distrito_num, nombres, source_version=0):
+        """
+        Votos de encuesta para cada nombre (en el mismo orden). `source_version`
+        identifica la versión de la lista de candidatos usada como entrada.
+        """
+        # '05' y 5 son el mismo distrito: memo y encuesta usan el número normalizado
+        distrito = str(int(distrito_num))
+        memo_key = (distrito, source_version)
+        cached = self._memo.get(memo_key)
+        if cached is not None:
+            return cached
+
+        poll = self._polls.get(f"D{distrito}")
+        votes, details = [], []
+        for nombre in nombres:
+            if poll is None:
+                votes.append(0.0)
+                continue
+            norm = normalize_string_aggressive(nombre)
+            key, score, rivals = poll.match(norm)
+            votes.append(float(poll.votes.get(key, 0.0)) if key else 0.0)
+            if key:
+                details.append((nombre, key, score, rivals))
+
+        result = tuple(votes)
+        with self._lock:
+            self._memo[memo_key] = result
+            self._details[distrito] = (poll, details)
+        return result
+
+    def report(self):
+        """
+        Por cada distrito ya cruzado: nombres de la encuesta que no se asignaron
+        a ningún candidato, cruces aproximados y cruces ambiguos.
+        """
+        out = {}
+        with self._lock:
+            items = list(self._details.items())
+
+        for distrito, (poll, details) in sorted(items, key=lambda x: int(x[0])):
+            if poll is None:
+                continue
+            claimed = defaultdict(list)
+            fuzzy, ambiguous = [], []
+            for nombre, key, score, rivals in details:
+                claimed[key].append(nombre)
+                if score < 1.0:
+                    fuzzy.append({"candidato": nombre, "encuesta": poll.names[key],
+                                  "score": round(score, 3)})
+                if rivals:
+                    ambiguous.append({"candidato": nombre, "encuesta": poll.names[key],
+                                      "alternativas": [poll.names[r] for r in rivals]})
+            for key, nombres in claimed.items():
+                if len(nombres) > 1:
+                    ambiguous.append({"candidatos": nombres, "encuesta": poll.names[key]})
+
+            out[distrito] = {
+                "sin_cruce": [poll.names[k] for k in poll.votes if k not in claimed],
+                "aproximados": fuzzy,
+                "ambiguos": ambiguous,
+            }
+        return out
@@ -0,0 +1,28 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Cantidad de procesos para los cálculos pesados (0 = uno por CPU)
+POOL_WORKERS = int(os.environ.get('POOL_WORKERS', 0))
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def pool_workers():
+    return POOL_WORKERS or os.cpu_count() or 1
+
+
+def get_process_pool():
+    """
+    Pool de procesos compartido por las simulaciones. Se crea al primer uso
+    con 'spawn' para no heredar los hilos ni locks del servidor Flask.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(
+                max_workers=pool_workers(), mp_context=multiprocessing.get_context('spawn'))
+    return _POOL
@@ -0,0 +1,77 @@
+import json
+import sys
+import threading
+from collections import Counter, OrderedDict
+
+
+def estimate_size(value):
+    """
+    Tamaño aproximado en bytes. Los objetos del modelo (DistrictData,
+    PhenomenaIndex, DistrictParity) informan su `nbytes`; tuplas y listas
+    suman sus elementos, y los dicts y valores de la API cuentan el largo
+    del JSON equivalente.
+    """
+    nbytes = getattr(value, 'nbytes', None)
+    if nbytes is not None:
+        return nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(map(estimate_size, value))
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class ResultCache:
+    """
+    Cache LRU de resultados calculados. Cada entrada ocupa un `slot`
+    (p. ej. ('nacional', tipo, escenario)) y guarda la versión de la data
+    con que se calculó: si la versión pedida es otra, el valor se recalcula
+    y reemplaza al anterior, así nunca se sirve un resultado desactualizado.
+    Se limita por cantidad de entradas y por memoria estimada (`sizeof`).
+    """
+
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024, sizeof=estimate_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self.stats = Counter()
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, slot, version, compute):
+        with self._lock:
+            entry = self._data.get(slot)
+            if entry is not None and entry[0] == version:
+                self._data.move_to_end(slot)
+                self.stats['hits'] += 1
+                return entry[1]
+            self.stats['misses'] += 1
+
+        value = compute()
+        size = self.sizeof(value)
+
+        with self._lock:
+            old = self._data.pop(slot, None)
+            if old is not None:
+                self.bytes -= old[2]
+                self.stats['invalidated'] += 1
+            if size <= self.max_bytes:
+                self._data[slot] = (version, value, size)
+                self.bytes += size
+            while self._data and (len(self._data) > self.max_entries or
+                                  self.bytes > self.max_bytes):
+                _, (_, _, evicted) = self._data.popitem(last=False)
+                self.bytes -= evicted
+                self.stats['evictions'] += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def info(self):
+        with self._lock:
+            return {"entradas": len(self._data), "bytes": self.bytes, **self.stats}
@@ -0,0 +1,172 @@
+import concurrent.futures
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+from district_results import DistrictUnavailable
+from instrumentation import span
+from models import DistrictData
+from parity import DistrictParity
+
+
+DISTRICTS = [str(i) for i in range(1, 29)]
+
+
+@dataclass(frozen=True)
+class DistrictSnapshot:
+    distrito: str
+    source_version: tuple
+    data: object        # DistrictData
+    elected: tuple      # índices de candidatos en data
+    genero: dict
+    paridad: object     # DistrictParity
+    error: str = None   # motivo si el distrito no está disponible
+
+
+@dataclass(frozen=True)
+class NationalSnapshot:
+    """
+    Resultado nacional publicado por el poller. No se modifica nunca: cada
+    actualización publica un objeto nuevo con `version` mayor. Los dicts
+    internos se comparten entre requests y deben tratarse como solo lectura.
+    """
+    version: int
+    generated_at: float
+    districts: MappingProxyType
+    payloads: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+
+
+def build_district(distrito, source_version, data):
+    with span('asignacion'):
+        elected = data.elect() if data.has_candidates else ()
+    parity = DistrictParity(data, elected)
+    return DistrictSnapshot(distrito, source_version, data, elected, parity.genero(), parity)
+
+
+def unavailable_district(distrito, source_version, error):
+    """Distrito sin votos confiables: sin candidatos ni escaños, con el motivo."""
+    data = DistrictData(distrito, 0)
+    parity = DistrictParity(data, ())
+    return DistrictSnapshot(distrito, source_version, data, (), parity.genero(), parity,
+                            error=str(error))
+
+
+class ResultsPoller:
+    """
+    Consulta periódicamente las fuentes de emol en segundo plano y recalcula
+    solo los distritos cuya versión de origen cambió.
+
+    - `district_version(distrito)` refresca las fuentes del distrito y
+      retorna una clave que cambia cuando cambia su data.
+    - `load_district(distrito)` arma el DistrictData del distrito o lanza
+      DistrictUnavailable; ese distrito queda en el snapshot sin escaños y
+      con `error`, y se reintenta en el ciclo siguiente.
+    - `build_payloads(districts)` precalcula las respuestas nacionales a
+      partir de los distritos del snapshot.
+
+    Los listeners registrados con `add_listener` reciben (anterior, nuevo)
+    cada vez que se publica un snapshot, desde el hilo del poller.
+    """
+
+    def __init__(self, district_version, load_district, build_payloads,
+                 interval=15, max_workers=14):
+        self.district_version = district_version
+        self.load_district = load_district
+        self.build_payloads = build_payloads
+        self.interval = interval
+        # Un solo pool de hilos para todos los ciclos (no uno por ciclo)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="results-fetch")
+
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._init_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._listeners = []
+        self.last_error = None
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _refresh_district(self, distrito, previous):
+        version = self.district_version(distrito)
+        if previous is not None and previous.error is None and previous.source_version == version:
+            return previous
+        try:
+            data = self.load_district(distrito)
+        except DistrictUnavailable as e:
+            # Se reintenta en cada ciclo; mientras el motivo no cambie el snapshot es el mismo
+            if previous is not None and previous.error == str(e):
+                return previous
+            return unavailable_district(distrito, version, e)
+        return build_district(distrito, version, data)
+
+    def _refresh_isolated(self, distrito, previous):
+        """
+        Un error inesperado en un distrito (fuente, parser o cálculo) lo deja
+        no disponible en este ciclo sin botar el refresh de los demás.
+        """
+        try:
+            return self._refresh_district(distrito, previous)
+        except Exception as e:
+            error = DistrictUnavailable(distrito, e)
+            if previous is not None and previous.error == str(error):
+                return previous
+            version = previous.source_version if previous is not None else None
+            return unavailable_district(distrito, version, error)
+
+    def refresh(self):
+        """Un ciclo de actualización. Publica un snapshot nuevo solo si algo cambió."""
+        current = self._snapshot
+        prev = current.districts if current else {}
+
+        with span('poller'):
+            results = list(self._executor.map(
+                lambda d: self._refresh_isolated(d, prev.get(d)), DISTRICTS))
+
+        if current and all(r is prev.get(r.distrito) for r in results):
+            return current
+
+        districts = MappingProxyType({r.distrito: r for r in results})
+        snapshot = NationalSnapshot(
+            version=(current.version + 1) if current else 1,
+            generated_at=time.time(),
+            districts=districts,
+            payloads=MappingProxyType(self.build_payloads(districts)))
+        with self._lock:
+            self._snapshot = snapshot
+        for listener in self._listeners:
+            listener(current, snapshot)
+        return snapshot
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="results-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        """Último snapshot publicado. El primer llamado lo calcula y arranca el poller."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._init_lock:
+                if self._snapshot is None:
+                    self.refresh()
+            self.start()
+            snapshot = self._snapshot
+        return snapshot
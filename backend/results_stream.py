@@ -0,0 +1,181 @@
+import json
+import os
+import queue
+import threading
+from collections import Counter, deque
+
+
+def _seats_by_pact(d):
+    return dict(Counter(d.data.pact_of(i) for i in d.elected))
+
+
+def _national_seats(snapshot):
+    nacional = snapshot.payloads.get('nacional') or {}
+    return {p['id']: p['seats'] for p in nacional.get('resumen', [])}
+
+
+def _candidate_votes(data):
+    return [{"_id": cid, "votes": v, "percentage": data.percentage(i)}
+            for i, (cid, v) in enumerate(zip(data.cand_id, data.cand_votes))]
+
+
+def district_state(d):
+    """Estado compacto de un distrito: votos y porcentaje por candidato, electos y escaños."""
+    return {
+        "distrito": d.distrito,
+        "candidatos": _candidate_votes(d.data),
+        "electos": [d.data.cand_id[i] for i in d.elected],
+        "escanos": _seats_by_pact(d)
+    }
+
+
+def full_state(snapshot):
+    return {
+        "version": snapshot.version,
+        "distritos": [district_state(d) for d in snapshot.districts.values()],
+        "nacional": snapshot.payloads.get('nacional')
+    }
+
+
+def snapshot_delta(prev, curr):
+    """
+    Cambios entre dos snapshots consecutivos: solo los distritos cuyo
+    snapshot cambió y, dentro de ellos, los candidatos con votos distintos,
+    los electos que entran o salen y los escaños por pacto que cambian.
+    """
+    distritos = []
+    for distrito, d in curr.districts.items():
+        old = prev.districts.get(distrito)
+        if old is d:
+            continue
+        if old is None:
+            distritos.append(district_state(d))
+            continue
+
+        before = {c['_id']: (c['votes'], c['percentage']) for c in _candidate_votes(old.data)}
+        candidatos = [c for c in _candidate_votes(d.data)
+                      if before.get(c['_id']) != (c['votes'], c['percentage'])]
+
+        old_ids = [old.data.cand_id[i] for i in old.elected]
+        new_ids = [d.data.cand_id[i] for i in d.elected]
+        old_seats, new_seats = _seats_by_pact(old), _seats_by_pact(d)
+        escanos = {pid: new_seats.get(pid, 0) for pid in set(old_seats) | set(new_seats)
+                   if old_seats.get(pid, 0) != new_seats.get(pid, 0)}
+
+        change = {"distrito": distrito}
+        if candidatos:
+            change["candidatos"] = candidatos
+        if old_ids != new_ids:
+            change["electos"] = {"entran": [i for i in new_ids if i not in old_ids],
+                                 "salen": [i for i in old_ids if i not in new_ids]}
+        if escanos:
+            change["escanos"] = escanos
+        if len(change) > 1:
+            distritos.append(change)
+
+    old_nat, new_nat = _national_seats(prev), _national_seats(curr)
+    return {
+        "version": curr.version,
+        "anterior": prev.version,
+        "distritos": distritos,
+        "nacional": {pid: new_nat.get(pid, 0) for pid in set(old_nat) | set(new_nat)
+                     if old_nat.get(pid, 0) != new_nat.get(pid, 0)}
+    }
+
+
+def sse_message(event, event_id, data):
+    body = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+    return f"id: {event_id}\nevent: {event}\ndata: {body}\n\n".encode('utf-8')
+
+
+class Subscriber:
+    def __init__(self, max_pending):
+        self.queue = queue.Queue(max_pending)
+        self.dropped = False
+
+
+class ResultBroadcaster:
+    """
+    Reparte los cambios de resultados a los clientes conectados por SSE.
+    Cada delta se calcula y serializa una sola vez por snapshot y se encola
+    tal cual a todos los suscriptores; un cliente que no alcanza a leer se
+    desconecta y al reconectar recupera lo perdido con Last-Event-ID.
+
+    Los ids de evento son 'época-versión'. Las versiones de snapshot parten
+    de nuevo en cada proceso; la época (al azar, como la sal de los ETag)
+    evita aplicar deltas de otro proceso o de antes de un reinicio sobre
+    un estado base que no corresponde.
+    """
+
+    def __init__(self, history=64, max_pending=32):
+        self.epoch = os.urandom(6).hex()
+        self.max_pending = max_pending
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._full = None
+        self._lock = threading.Lock()
+
+    def publish(self, prev, snapshot):
+        """Listener del poller: arma el delta del nuevo snapshot y lo difunde."""
+        if prev is None:
+            return
+        message = (snapshot.version, sse_message(
+            'delta', self.event_id(snapshot.version), snapshot_delta(prev, snapshot)))
+        with self._lock:
+            self._history.append(message)
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            try:
+                sub.queue.put_nowait(message)
+            except queue.Full:
+                sub.dropped = True
+                self.unsubscribe(sub)
+
+    def subscribe(self):
+        sub = Subscriber(self.max_pending)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def full_message(self, snapshot):
+        """Snapshot completo serializado, reutilizado mientras no cambie la versión."""
+        with self._lock:
+            if self._full is not None and self._full[0] == snapshot.version:
+                return self._full[1]
+        message = sse_message('snapshot', self.event_id(snapshot.version), full_state(snapshot))
+        with self._lock:
+            self._full = (snapshot.version, message)
+        return message
+
+    def event_id(self, version):
+        return f"{self.epoch}-{version}"
+
+    def event_version(self, event_id):
+        """Versión de un id de evento de este proceso; None si es de otra época."""
+        epoch, _, version = (event_id or '').partition('-')
+        if epoch != self.epoch or not (version.isascii() and version.isdigit()):
+            return None
+        return int(version)
+
+    def catch_up(self, last_event_id, snapshot):
+        """
+        Mensajes iniciales de una conexión: los deltas posteriores a
+        `last_event_id` si es de esta época y siguen en el historial, o el
+        snapshot completo.
+        """
+        last_id = self.event_version(last_event_id)
+        with self._lock:
+            history = list(self._history)
+        if last_id is not None and last_id <= snapshot.version:
+            missed = [m for m in history if last_id < m[0] <= snapshot.version]
+            if last_id == snapshot.version or (missed and missed[0][0] == last_id + 1):
+                return [m[1] for m in missed]
+        return [self.full_message(snapshot)]
+
+    def info(self):
+        with self._lock:
+            return {"suscriptores": len(self._subscribers), "historial": len(self._history)}
@@ -0,0 +1,119 @@
+import re
+
+
+SCENARIOS = {
+    "derecha_unida": {
+        "new_id": "SC_DER",
+        "new_name": "Gran Pacto Derecha",
+        "merge_ids": ["J", "K"],
+        "color_ref": "K"
+    },
+    "izquierda_unida": {
+        "new_id": "SC_IZQ",
+        "new_name": "Gran Pacto Izquierda",
+
+
+        "merge_ids": ["A", "B", "C", "D", "F", "G", "H"],
+        "color_ref": "C"
+    }
+}
+
+# Separador de pactos dentro de una alianza: '+' o espacios
+_ALLIANCE_SEP = re.compile(r'[+\s]+')
+
+
+class ScenarioOverlay:
+    """
+    Fusión de pactos representada como tabla de remapeo pacto -> pacto
+    fusionado. No toca la data base del distrito: los votos fusionados y
+    el remapeo de partidos se aplican al momento de asignar escaños, así la
+    misma data se puede compartir entre requests y escenarios.
+    `slot` separa los escenarios predefinidos de las alianzas libres en
+    las claves de cache, aunque su `key` coincida.
+    """
+
+    def __init__(self, key, groups, kind='escenario'):
+        self.key = key
+        self.slot = (kind, key)
+        self.groups = groups
+        self.pact_map = {pid: g['new_id'] for g in groups for pid in g['merge_ids']}
+        self.names = {g['new_id']: g['new_name'] for g in groups}
+        self.color_refs = {g['new_id']: g['color_ref'] for g in groups}
+
+    def is_merged(self, pact_id):
+        return pact_id in self.names
+
+    def is_absorbed(self, pact_id):
+        return pact_id in self.pact_map
+
+    def color_key(self, pact_id):
+        return self.color_refs.get(pact_id, pact_id)
+
+    def merge_pacts(self, district):
+        """
+        Vista del distrito con los pactos fusionados sumados: primero los
+        que no se fusionan, en su orden, y al final cada pacto fusionado que
+        tenga votos.
+        """
+        merged = {g['new_id']: 0.0 for g in self.groups}
+        ids, names, votes = [], [], []
+        for pid, name, v in zip(district.pact_id, district.pact_name, district.pact_votes):
+            target = self.pact_map.get(pid)
+            if target is None:
+                ids.append(pid)
+                names.append(name)
+                votes.append(v)
+            else:
+                merged[target] += v
+
+        for g in self.groups:
+            if merged[g['new_id']] > 0:
+                ids.append(g['new_id'])
+                names.append(g['new_name'])
+                votes.append(merged[g['new_id']])
+        return district.with_pacts(ids, names, votes, self.pact_map)
+
+
+
+def scenario_overlay(scenario_key):
+    """Overlay de un escenario predefinido, o None si no existe."""
+    sc = SCENARIOS.get(scenario_key)
+    if not sc:
+        return None
+    return ScenarioOverlay(scenario_key, [sc])
+
+
+def parse_alliances(spec, known_pacts, names=None):
+    """
+    Alianzas definidas en el request, p. ej. "A+B+C,J+K": cada grupo se
+    fusiona en un pacto 'SC_A_B_C'. Un pacto no puede estar en dos grupos.
+    Dentro de un grupo los pactos también se separan por espacios, porque
+    un '+' sin codificar llega como espacio en el query string.
+    Lanza ValueError si la definición no es válida.
+    """
+    names = names or {}
+    groups, seen = [], set()
+    for raw in spec.split(','):
+        ids = [p.upper() for p in _ALLIANCE_SEP.split(raw) if p]
+        if not ids:
+            continue
+        unknown = [p for p in ids if p not in known_pacts]
+        if unknown:
+            raise ValueError(f"Pactos desconocidos: {', '.join(unknown)}")
+        repeated = [p for p in ids if p in seen]
+        if repeated or len(set(ids)) != len(ids):
+            raise ValueError(f"Pacto repetido en alianzas: {', '.join(repeated or ids)}")
+        seen.update(ids)
+        if len(ids) < 2:
+            continue
+        groups.append({
+            "new_id": "SC_" + "_".join(ids),
+            "new_name": " + ".join(names.get(p, p) for p in ids),
+            "merge_ids": ids,
+            "color_ref": ids[0]
+        })
+
+    if not groups:
+        raise ValueError("Las alianzas deben agrupar al menos dos pactos")
+    key = ",".join("+".join(g['merge_ids']) for g in groups)
+    return ScenarioOverlay(key, groups, kind='alianzas')
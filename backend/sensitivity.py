@@ -0,0 +1,144 @@
+import math
+from collections import defaultdict
+from fractions import Fraction
+
+from dhondt import seats_by_list
+
+
+def _votes_to_beat(quotient, wins_tie, divisor, integral):
+    """
+    Mínimo de votos v con los que v/divisor le gana a `quotient`. En empate
+    gana la lista de menor índice (`wins_tie`). Con votos enteros el
+    resultado es exacto; con porcentajes se retorna el umbral.
+    """
+    threshold = quotient * divisor
+    if not integral:
+        return float(threshold)
+    return math.ceil(threshold) if wins_tie else math.floor(threshold) + 1
+
+
+def list_margins(votes, seats, num_seats, caps=None):
+    """
+    Para cada lista, votos que le faltan para ganar un escaño más y votos
+    que puede perder hasta quedarse sin el último, dejando fijos los votos
+    de las demás listas. Sale directo de la tabla de cocientes: el próximo
+    cociente de la lista debe superar al cociente ganador más débil de las
+    otras, y su último cociente ganador debe seguir sobre el mejor cociente
+    perdedor de las otras. None cuando no hay con quién disputar el escaño
+    (o la lista ya no tiene candidatos, según `caps`). Si quedan escaños
+    sin repartir, a una lista con cupo le basta un voto.
+    """
+    integral = all(float(v).is_integer() for v in votes)
+    num = [Fraction(int(v)) if integral else float(v) for v in votes]
+
+    # Cociente ganador más débil y mejor cociente perdedor de cada lista,
+    # como (cociente, -índice) para que el empate favorezca al menor índice
+    weakest = [(num[i] / s, -i) if s else None for i, s in enumerate(seats)]
+    next_q = [(num[i] / (s + 1), -i) if num[i] > 0 and (caps is None or s < caps[i])
+              else None for i, s in enumerate(seats)]
+    vacant = sum(seats) < num_seats
+
+    out = []
+    for i, s in enumerate(seats):
+        gain = lose = None
+
+        rivals = [w for j, w in enumerate(weakest) if j != i and w is not None]
+        if vacant and (caps is None or s < caps[i]):
+            gain = (1 - num[i]) if integral else 0.0
+        elif rivals and (caps is None or s < caps[i]):
+            q, neg_j = min(rivals)
+            gain = _votes_to_beat(q, i < -neg_j, s + 1, integral) - num[i]
+
+        if s:
+            rivals = [n for j, n in enumerate(next_q) if j != i and n is not None]
+            if rivals:
+                q, neg_j = max(rivals)
+                keep = _votes_to_beat(q, i < -neg_j, s, integral)
+                lose = num[i] - max(keep, 1) + 1 if integral else num[i] - keep
+
+        out.append((_plain(gain), _plain(lose)))
+    return out
+
+
+def _plain(value):
+    if value is None:
+        return None
+    if isinstance(value, Fraction):
+        return int(value)
+    return round(value, 4)
+
+
+def district_sensitivity(district):
+    """
+    Márgenes de un distrito en las dos etapas de calculate_dhondt: entre
+    pactos, y entre partidos dentro de cada pacto con sus escaños fijos y
+    el tope de candidatos de cada partido. `district` es un DistrictData
+    (o la vista de un escenario, con sus pactos fusionados).
+    """
+    won = seats_by_list(district.pact_votes, district.seats)
+    pact_seats = [won.get(i, 0) for i in range(len(district.pact_id))]
+
+    sizes = district.party_sizes()
+    parties_by_pact = defaultdict(list)
+    for q, p in enumerate(district.party_pact):
+        if p >= 0:
+            parties_by_pact[p].append(q)
+
+    out = []
+    margins = list_margins(district.pact_votes, pact_seats, district.seats)
+    for p, (seats, (gain, lose)) in enumerate(zip(pact_seats, margins)):
+        members = parties_by_pact.get(p, [])
+        votes = [district.party_votes[q] for q in members]
+        caps = [sizes[q] for q in members]
+        party_won = seats_by_list(votes, seats, caps)
+        party_seats = [party_won.get(i, 0) for i in range(len(members))]
+
+        partidos = []
+        for q, n, cap, (p_gain, p_lose) in zip(
+                members, party_seats, caps, list_margins(votes, party_seats, seats, caps)):
+            partidos.append({
+                "_id": district.party_id[q],
+                "name": district.party_name[q],
+                "votes": district.party_votes[q],
+                "escanos": n,
+                "candidatos": cap,
+                "votos_para_ganar": p_gain,
+                "votos_para_perder": p_lose
+            })
+
+        out.append({
+            "_id": district.pact_id[p],
+            "name": district.pact_name[p],
+            "votes": district.pact_votes[p],
+            "escanos": seats,
+            "votos_para_ganar": gain,
+            "votos_para_perder": lose,
+            "partidos": partidos
+        })
+    return out
+
+
+def national_sensitivity(districts, limit=10):
+    """
+    Márgenes de todos los distritos y los escaños más disputados del país:
+    los pactos más cerca de ganar uno y los más cerca de perderlo.
+    """
+    distritos, gains, losses = [], [], []
+    for distrito, district in districts:
+        pactos = district_sensitivity(district)
+        distritos.append({"distrito": distrito, "escanos": district.seats, "pactos": pactos})
+        for p in pactos:
+            ref = {"distrito": distrito, "_id": p['_id'], "name": p['name'],
+                   "escanos": p['escanos']}
+            if p['votos_para_ganar'] is not None and p['votes'] > 0:
+                gains.append({**ref, "votos": p['votos_para_ganar']})
+            if p['votos_para_perder'] is not None:
+                losses.append({**ref, "votos": p['votos_para_perder']})
+
+    gains.sort(key=lambda x: x['votos'])
+    losses.sort(key=lambda x: x['votos'])
+    return {
+        "distritos": distritos,
+        "mas_cerca_de_ganar": gains[:limit],
+        "mas_cerca_de_perder": losses[:limit]
+    }
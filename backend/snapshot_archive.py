@@ -0,0 +1,197 @@
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+import requests
+
+from district_results import URL_METADATA_JSON, URL_XML_TEMPLATE
+
+
+DISTRICT_IDS = [f"60{i:02d}" for i in range(1, 29)]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documentos (
+    url TEXT PRIMARY KEY,
+    contenido BLOB NOT NULL,
+    tamano INTEGER NOT NULL,
+    etag TEXT NOT NULL,
+    last_modified TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+
+def archive_urls(extra=()):
+    """URLs de un snapshot completo: dbres.json y los 28 XML de distrito."""
+    return [URL_METADATA_JSON] + [URL_XML_TEMPLATE.format(d_id=d) for d in DISTRICT_IDS] + list(extra)
+
+
+class SnapshotArchive:
+    """
+    Snapshot de las fuentes de emol en un solo archivo sqlite: el cuerpo
+    crudo de cada URL comprimido con zlib, tal como se descargó. Al leerlo
+    se descomprime una sola vez y queda en memoria.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._docs = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def write(self, documents, meta=None):
+        """`documents` es {url: (contenido, last_modified)}; reemplaza lo que había."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM documentos")
+                conn.execute("DELETE FROM meta")
+                conn.executemany(
+                    "INSERT INTO documentos VALUES (?, ?, ?, ?, ?)",
+                    [(url, zlib.compress(body, 9), len(body),
+                      '"%s"' % hashlib.sha1(body).hexdigest(), last_modified)
+                     for url, (body, last_modified) in documents.items()])
+                conn.executemany("INSERT INTO meta VALUES (?, ?)",
+                                 [(k, json.dumps(v)) for k, v in (meta or {}).items()])
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        with self._lock:
+            self._docs = None
+
+    def documents(self):
+        """{url: (contenido, etag, last_modified)}, leído del archivo al primer uso."""
+        with self._lock:
+            if self._docs is None:
+                conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+                try:
+                    rows = conn.execute(
+                        "SELECT url, contenido, etag, last_modified FROM documentos").fetchall()
+                finally:
+                    conn.close()
+                self._docs = {url: (zlib.decompress(blob), etag, lm)
+                              for url, blob, etag, lm in rows}
+            return self._docs
+
+    def meta(self):
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            rows = conn.execute("SELECT clave, valor FROM meta").fetchall()
+            sizes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamano), 0), "
+                "COALESCE(SUM(LENGTH(contenido)), 0) FROM documentos").fetchone()
+        finally:
+            conn.close()
+        return {**{k: json.loads(v) for k, v in rows},
+                "documentos": sizes[0], "bytes": sizes[1], "bytes_comprimidos": sizes[2]}
+
+
+class ArchivedResponse:
+    """Respuesta con la interfaz mínima de requests.Response que usa CachedResource."""
+
+    def __init__(self, url, status_code, content=b'', headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} para {self.url}", response=self)
+
+
+class ArchiveClient:
+    """
+    Cliente con la misma firma `get` que HttpClient que responde desde un
+    SnapshotArchive, con ETag y 304 como el origen.
+
+    Sin `upstream` es modo replay: nunca sale a la red y una URL que no está
+    en el archivo falla como un error de conexión. Con `upstream` es modo
+    respaldo: se consulta el origen y el archivo solo responde cuando el
+    origen falla o contesta con error.
+    """
+
+    def __init__(self, archive, upstream=None):
+        self.archive = archive
+        self.upstream = upstream
+
+    def get(self, url, headers=None, timeout=None):
+        if self.upstream is not None:
+            try:
+                r = self.upstream.get(url, headers=headers, timeout=timeout)
+                if r.status_code < 500:
+                    return r
+            except requests.RequestException:
+                pass
+
+        doc = self.archive.documents().get(url)
+        if doc is None:
+            raise requests.ConnectionError(f"{url} no está en {self.archive.path}")
+        body, etag, last_modified = doc
+        response_headers = {'ETag': etag}
+        if last_modified:
+            response_headers['Last-Modified'] = last_modified
+        if headers and headers.get('If-None-Match') == etag:
+            return ArchivedResponse(url, 304, b'', response_headers)
+        return ArchivedResponse(url, 200, body, response_headers)
+
+
+def record(path, client, urls, workers=8):
+    """
+    Descarga `urls` con `client` y las guarda como un snapshot. Falla si
+    alguna no responde 200, para no dejar un archivo a medias.
+    """
+    def fetch(url):
+        r = client.get(url)
+        r.raise_for_status()
+        return url, (r.content, r.headers.get('Last-Modified'))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        documents = dict(pool.map(fetch, urls))
+    SnapshotArchive(path).write(documents, {
+        "grabado": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "urls": len(documents)
+    })
+    return SnapshotArchive(path).meta()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Graba o inspecciona un snapshot de las fuentes de emol.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    grabar = sub.add_parser('grabar', help="descarga dbres.json y los 28 XML a un archivo")
+    grabar.add_argument('archivo')
+    grabar.add_argument('--url', action='append', default=[],
+                        help="URL adicional a incluir (p. ej. la API de encuestas)")
+    info = sub.add_parser('info', help="muestra el contenido de un snapshot")
+    info.add_argument('archivo')
+    args = parser.parse_args(argv)
+
+    if args.comando == 'grabar':
+        from http_client import HttpClient
+        client = HttpClient(max_concurrency=8, headers={'User-Agent': 'Mozilla/5.0'})
+        meta = record(args.archivo, client, archive_urls(args.url))
+    else:
+        meta = SnapshotArchive(args.archivo).meta()
+    json.dump(meta, sys.stdout, indent=2, ensure_ascii=False)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Fixtures compartidas de los tests del backend. app.py lee su
+configuración del entorno al importarse, así que se importa una sola vez
+por sesión, en modo replay sobre un snapshot sintético de emol
+(bench/fixtures.py): sin red, sin historial y sin poller en segundo plano.
+
+Correr desde backend/:  python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+# Distritos cuyo XML viene dañado en el snapshot de los tests
+TRUNCATED_DISTRICT, MALFORMED_DISTRICT = '1', '2'
+
+
+def snapshot_documents():
+    """
+    Documentos del snapshot sintético que sirve el archivo de los tests.
+    El XML del distrito 1 está cortado a la mitad y el del distrito 2 trae
+    un VOTOS que no es un número.
+    """
+    from bench.fixtures import synthetic_documents
+    from district_results import URL_XML_TEMPLATE
+
+    documents = synthetic_documents()
+    url = URL_XML_TEMPLATE.format(d_id='6001')
+    body, headers = documents[url]
+    documents[url] = (body[:len(body) // 2], headers)
+    url = URL_XML_TEMPLATE.format(d_id='6002')
+    body, headers = documents[url]
+    # La primera fila es el total; se daña la de un candidato
+    total, sep, rows = body.partition(b'</ROW>')
+    documents[url] = (total + sep + rows.replace(b'<VOTOS>', b'<VOTOS>12a', 1), headers)
+    return documents
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    from snapshot_archive import SnapshotArchive
+
+    archive = str(tmp_path_factory.mktemp('emol') / 'emol.sqlite')
+    SnapshotArchive(archive).write(snapshot_documents(), {"tests": True})
+    os.environ['SNAPSHOT_FILE'] = archive
+    os.environ['SNAPSHOT_MODE'] = 'replay'
+    os.environ['HISTORY_FILE'] = ''
+    os.environ['RESULTS_POLL_INTERVAL'] = '3600'
+    # app.py abre db.json, dip.csv y encuestas.json con rutas relativas
+    os.chdir(BACKEND_DIR)
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
@@ -0,0 +1,57 @@
+"""Parámetros inválidos de los endpoints: 400 en vez de resultados vacíos o un 500."""
+import pytest
+
+
+@pytest.mark.parametrize('query', [
+    'concentracion=nan', 'concentracion=inf', 'concentracion=-inf', 'concentracion=0',
+    'semilla=-1', 'simulaciones=0', 'simulaciones=abc',
+])
+def test_montecarlo_rejects_invalid_params(client, query):
+    assert client.get('/simulacion/montecarlo?' + query).status_code == 400
+
+
+def test_montecarlo_accepts_valid_params(client):
+    r = client.get('/simulacion/montecarlo?simulaciones=5&concentracion=50&semilla=3')
+    assert r.status_code == 200
+    assert r.get_json()['meta'] == {"simulaciones": 5, "concentracion": 50.0, "semilla": 3}
+
+
+@pytest.mark.parametrize('limite', ['-1', 'x'])
+def test_coaliciones_rejects_invalid_limit(client, limite):
+    assert client.get('/simulacion/coaliciones?pactos=C,B,J&limite=' + limite).status_code == 400
+
+
+def test_coaliciones_limit(client):
+    r = client.get('/simulacion/coaliciones?pactos=C,B,J&limite=2')
+    assert r.status_code == 200
+    assert len(r.get_json()['mejores']) == 2
+
+
+@pytest.mark.parametrize('limit', ['-1', 'x'])
+def test_sensibilidad_rejects_invalid_limit(client, limit):
+    assert client.get('/stats/sensibilidad?tipo=simulacion&limit=' + limit).status_code == 400
+
+
+def test_sensibilidad_limit(client):
+    r = client.get('/stats/sensibilidad?tipo=simulacion&limit=3')
+    assert r.status_code == 200
+    assert len(r.get_json()['mas_cerca_de_ganar']) == 3
+
+
+@pytest.mark.parametrize('query', [
+    'cuota_min=nan', 'cuota_max=inf', 'cuota_min=-inf', 'pacto=ZZ', 'genero=X', 'limit=-1',
+])
+def test_fenomenos_rejects_invalid_filters(client, query):
+    assert client.get('/stats/fenomenos?' + query).status_code == 400
+
+
+def test_fenomenos_filters_do_not_grow_the_index(client, app_module):
+    assert client.get('/stats/fenomenos?pacto=J&genero=m').status_code == 200
+    assert client.get('/stats/fenomenos?escenario=derecha_unida&pacto=SC_DER').status_code == 200
+    index = app_module.RESULT_CACHE.get_or_compute(
+        ('fenomenos', 'real', ''), app_module.data_version('real'), lambda: None)
+    before = len(index._orders)
+    # Un pacto que no está en el índice no deja sublistas guardadas
+    rows, more = index.top('arrastrados', 10, pacto='ZZ')
+    assert rows == [] and not more
+    assert len(index._orders) == before
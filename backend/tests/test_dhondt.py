@@ -0,0 +1,196 @@
+"""
+Pruebas diferenciales del motor D'Hondt: calculate_dhondt (dicts) y
+DistrictData.elect (columnas) deben elegir exactamente lo mismo que la
+implementación original con tabla de cocientes ordenada, que se conserva
+aquí como referencia. dhondt_batch (muchos escenarios a la vez) se
+compara contra calculate_dhondt.
+"""
+import random
+from collections import defaultdict
+from dataclasses import asdict
+
+import numpy as np
+import pytest
+
+from dhondt import calculate_dhondt, seats_by_list
+from dhondt_batch import DistrictTables, dhondt_batch, elected_candidates
+from models import DistrictBuilder
+from scenarios import SCENARIOS, scenario_overlay
+
+
+def reference_dhondt(candidates_list, parties_list, pacts_list, num_seats):
+    """calculate_dhondt tal como estaba en app.py antes del motor con heap."""
+    pact_votes = {p['_id']: p['votes'] for p in pacts_list}
+    party_votes = {p['_id']: p['votes'] for p in parties_list}
+    party_to_pact = {p['_id']: p['list_id'] for p in parties_list}
+
+    party_candidates = defaultdict(list)
+    for c in candidates_list:
+        party_candidates[c['party_id']].append(c)
+
+    for pid in party_candidates:
+        party_candidates[pid].sort(key=lambda x: x['votes'], reverse=True)
+
+    quotients_pacts = []
+    for pid, votes in pact_votes.items():
+        if votes > 0:
+            for i in range(1, num_seats + 1):
+                quotients_pacts.append((votes/i, pid))
+
+    quotients_pacts.sort(key=lambda x: x[0], reverse=True)
+    winning_pacts = quotients_pacts[:num_seats]
+
+    seats_per_pact = defaultdict(int)
+    for _, pid in winning_pacts:
+        seats_per_pact[pid] += 1
+
+    elected = []
+    for pact_id, seats_won in seats_per_pact.items():
+        parties_in_pact = [pid for pid,
+                           lid in party_to_pact.items() if lid == pact_id]
+        quotients_parties = []
+        for party_id in parties_in_pact:
+            pvotes = party_votes.get(party_id, 0)
+            if pvotes > 0:
+                c_count = len(party_candidates.get(party_id, []))
+                limit = max(seats_won, c_count)
+                for i in range(1, limit + 1):
+                    quotients_parties.append((pvotes/i, party_id, i-1))
+
+        quotients_parties.sort(key=lambda x: x[0], reverse=True)
+        seats_assigned = 0
+        for _, party_id, cand_idx in quotients_parties:
+            if seats_assigned >= seats_won:
+                break
+            cands = party_candidates.get(party_id, [])
+            if cand_idx < len(cands):
+                candidate = cands[cand_idx]
+                if candidate not in elected:
+                    elected.append(candidate)
+                    seats_assigned += 1
+
+    final = [asdict(c) if not isinstance(c, dict) else c for c in elected]
+    final.sort(key=lambda x: x['votes'], reverse=True)
+    return final
+
+
+SCENARIO_KEYS = [''] + sorted(SCENARIOS)
+
+
+def scenario_inputs(data, scenario):
+    """
+    (vista con el escenario, payload de entrada para las versiones con
+    dicts): los partidos fusionados quedan con el pacto nuevo en list_id,
+    como hacía la copia modificada de la data antes del overlay.
+    """
+    overlay = scenario_overlay(scenario)
+    if overlay is None:
+        # Vista propia igual a la base, así se le puede cambiar `seats`
+        return (data.with_pacts(data.pact_id, data.pact_name, data.pact_votes, None),
+                data.to_payload())
+    view = overlay.merge_pacts(data)
+    parties = [{**p, 'list_id': overlay.pact_map.get(p['list_id'], p['list_id'])}
+               for p in data.parties_payload()]
+    return view, {"candidates": data.candidates_payload(), "parties": parties,
+                  "pacts": view.pacts_payload(), "seats": data.seats}
+
+
+def assert_same_allocation(view, payload, seats):
+    expected = reference_dhondt(payload['candidates'], payload['parties'],
+                                payload['pacts'], seats)
+    got = calculate_dhondt(payload['candidates'], payload['parties'], payload['pacts'], seats)
+    assert got == expected
+
+    view.seats = seats
+    assert [view.cand_id[i] for i in view.elect()] == [c['_id'] for c in expected]
+
+
+@pytest.fixture(scope='module')
+def districts(app_module):
+    """Los 28 distritos de la simulación (encuestas sobre dip.csv)."""
+    return [app_module.load_simulation_district(str(i)) for i in range(1, 29)]
+
+
+@pytest.mark.parametrize('scenario', SCENARIO_KEYS)
+def test_28_districts_match_reference(districts, scenario):
+    assert len(districts) == 28
+    for data in districts:
+        for seats in range(1, 12):
+            view, payload = scenario_inputs(data, scenario)
+            assert_same_allocation(view, payload, seats)
+
+
+def random_district(rng):
+    """Distrito al azar con empates, listas sin votos y partidos cortos."""
+    builder = DistrictBuilder('0', rng.randint(1, 12))
+    pacts = [chr(ord('A') + k) for k in range(rng.randint(1, 6))]
+    n = 0
+    for pact in pacts:
+        for q in range(rng.randint(1, 4)):
+            party = f"{pact}-P{q}"
+            for _ in range(rng.randint(1, 5)):
+                n += 1
+                # Votos chicos para forzar empates entre cocientes
+                votes = float(rng.choice((0, 0, 1, 2, 3, 4, 6, 8, 12, rng.randint(0, 50))))
+                builder.add(str(n), f"Candidato {n}", pact, f"Pacto {pact}", party, party,
+                            votes, rng.choice('HM'), '', party)
+    return builder.build()
+
+
+def test_random_inputs_match_reference():
+    rng = random.Random(2025)
+    for _ in range(3000):
+        data = random_district(rng)
+        scenario = rng.choice(SCENARIO_KEYS)
+        view, payload = scenario_inputs(data, scenario)
+        assert_same_allocation(view, payload, data.seats)
+
+
+def test_seats_by_list_breaks_ties_by_list_order():
+    assert seats_by_list([10, 10, 5], 3) == {0: 2, 1: 1}
+    assert seats_by_list([0, 7], 2) == {1: 2}
+    assert seats_by_list([6, 3], 3, caps=[1, 5]) == {0: 1, 1: 2}
+
+
+def test_batch_matches_calculate_dhondt():
+    rng = random.Random(2026)
+    for _ in range(1000):
+        data = random_district(rng)
+        view, payload = scenario_inputs(data, rng.choice(SCENARIO_KEYS))
+        seats = rng.randint(1, 12)
+        tables = DistrictTables(payload['candidates'], payload['parties'], payload['pacts'])
+
+        # Fila 0: votos de la data; las demás, votos chicos al azar (empates y ceros)
+        cand_votes = np.array(
+            [tables.cand_votes] +
+            [[rng.choice((0, 0, 1, 2, 3, 5, 8)) for _ in tables.candidates] for _ in range(3)],
+            dtype=float)
+        pact_votes, party_votes = tables.aggregate(cand_votes)
+        result = dhondt_batch(tables, pact_votes, party_votes, seats, cand_votes)
+
+        for s in range(len(cand_votes)):
+            candidates = [{**c, 'votes': float(v)}
+                          for c, v in zip(payload['candidates'], cand_votes[s])]
+            parties = [{**p, 'votes': float(v)}
+                       for p, v in zip(payload['parties'], party_votes[s])]
+            pacts = [{**p, 'votes': float(v)}
+                     for p, v in zip(payload['pacts'], pact_votes[s])]
+            expected = calculate_dhondt(candidates, parties, pacts, seats)
+            got = elected_candidates(tables, result, s, pact_votes, cand_votes)
+            assert got == expected
+            # Un pacto puede ganar más escaños que candidatos: esos quedan sin llenar
+            assert result.party_seats[s].sum() == len(expected)
+            assert result.party_seats[s].sum() <= result.pact_seats[s].sum()
+
+
+def test_batch_tables_from_district_match_payload():
+    rng = random.Random(7)
+    for _ in range(300):
+        data = random_district(rng)
+        view, payload = scenario_inputs(data, rng.choice(SCENARIO_KEYS))
+        tables = DistrictTables.from_district(view)
+        result = dhondt_batch(tables, tables.pact_votes, tables.party_votes, data.seats)
+        expected = calculate_dhondt(payload['candidates'], payload['parties'],
+                                    payload['pacts'], data.seats)
+        assert [c['_id'] for c in elected_candidates(tables, result)] == \
+            [c['_id'] for c in expected]
@@ -0,0 +1,108 @@
+"""
+XML de distrito dañados: el parser los rechaza y el distrito queda como
+no disponible en vez de contarse con votos en cero.
+"""
+import pytest
+
+from conftest import MALFORMED_DISTRICT, TRUNCATED_DISTRICT, snapshot_documents
+from district_results import (URL_XML_TEMPLATE, DistrictUnavailable, ResultsParseError,
+                              parse_results_xml)
+from results_poller import ResultsPoller
+
+
+BROKEN = (TRUNCATED_DISTRICT, MALFORMED_DISTRICT)
+
+
+def xml_body(distrito):
+    return snapshot_documents()[URL_XML_TEMPLATE.format(d_id=f"60{int(distrito):02d}")][0]
+
+
+def test_parser_rejects_truncated_xml():
+    with pytest.raises(ResultsParseError) as e:
+        parse_results_xml(xml_body(TRUNCATED_DISTRICT))
+    assert e.value.partial
+
+
+def test_parser_rejects_malformed_votes():
+    with pytest.raises(ResultsParseError, match="VOTOS no es un entero"):
+        parse_results_xml(xml_body(MALFORMED_DISTRICT))
+
+
+def test_parser_rejects_votes_beyond_int64():
+    body = xml_body('3').replace(b'<VOTOS>', b'<VOTOS>' + b'9' * 30, 1)
+    with pytest.raises(ResultsParseError, match="VOTOS no es un entero"):
+        parse_results_xml(body)
+
+
+def test_parser_wraps_decoding_errors():
+    body = xml_body('3').decode('utf-8').encode('utf-16')
+    with pytest.raises(ResultsParseError, match="codificación"):
+        parse_results_xml(body[:-1])
+    with pytest.raises(ResultsParseError, match="codificación"):
+        parse_results_xml(b"<?xml version='1.0' encoding='x-desconocida'?><ROWSET></ROWSET>")
+
+
+def test_parser_reads_utf16_xml():
+    body = xml_body('3')
+    assert list(parse_results_xml(body.decode('utf-8').encode('utf-16'))[0].items()) == \
+        list(parse_results_xml(body)[0].items())
+
+
+def test_parser_reads_valid_xml():
+    votes, total = parse_results_xml(xml_body('3'))
+    assert len(votes) > 0 and total > 0
+
+
+@pytest.mark.parametrize('distrito', BROKEN)
+def test_broken_district_is_unavailable(app_module, distrito):
+    with pytest.raises(DistrictUnavailable) as e:
+        app_module.load_real_district(distrito)
+    assert e.value.distrito == distrito
+    assert isinstance(e.value.cause, ResultsParseError)
+
+
+@pytest.mark.parametrize('url', ['/candidatos?tipo=real&distrito={}',
+                                 '/dhondt?tipo=real&distrito={}'])
+@pytest.mark.parametrize('distrito', BROKEN)
+def test_district_endpoints_return_503(client, url, distrito):
+    r = client.get(url.format(distrito))
+    assert r.status_code == 503
+    assert r.get_json()['distrito'] == distrito
+
+
+@pytest.mark.parametrize('query', ['', '&escenario=izquierda_unida'])
+def test_national_results_are_flagged_partial(client, app_module, query):
+    r = client.get('/nacional?tipo=real' + query)
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body['parcial'] is True
+    assert [d['distrito'] for d in body['distritos_no_disponibles']] == list(BROKEN)
+
+    snapshot = app_module.RESULTS_POLLER.snapshot()
+    available = [d for d in snapshot.districts.values() if d.error is None]
+    assert len(available) == 26
+    assert not any(snapshot.districts[d].elected for d in BROKEN)
+    # Los escaños repartidos son solo los de los distritos disponibles
+    assert sum(p['seats'] for p in body['resumen']) == sum(d.data.seats for d in available)
+
+
+def test_unavailable_district_keeps_snapshot_between_cycles(app_module):
+    poller = app_module.RESULTS_POLLER
+    before = poller.snapshot()
+    assert poller.refresh() is before
+
+
+def test_refresh_isolates_unexpected_district_errors(app_module):
+    def load_district(distrito):
+        if distrito == '7':
+            raise UnicodeDecodeError('utf-16', b'\x00', 0, 1, 'truncated data')
+        return app_module.load_simulation_district(distrito)
+
+    poller = ResultsPoller(lambda d: (d,), load_district, lambda districts: {})
+    snapshot = poller.refresh()
+    assert len(snapshot.districts) == 28
+    assert 'truncated data' in snapshot.districts['7'].error
+    assert not snapshot.districts['7'].elected
+    assert all(d.error is None for k, d in snapshot.districts.items() if k != '7')
+    # Mismo error en el ciclo siguiente: no se publica un snapshot nuevo
+    assert poller.refresh() is snapshot
@@ -0,0 +1,18 @@
+"""
+Cruce de nombres contra la encuesta (PollMatchIndex).
+"""
+from poll_matching import PollMatchIndex
+
+
+POLL = {"D5": [{"nombre": "Ana Pérez", "votos": 120},
+               {"nombre": "Juan Soto", "votos": 80}]}
+
+
+def test_district_number_is_normalized_for_memo_and_lookup():
+    index = PollMatchIndex(POLL)
+    nombres = ["ANA PEREZ", "Juan Soto"]
+    # '05' se consulta primero: no debe dejar el memo del distrito 5 en ceros
+    assert index.match_district("05", nombres) == (120.0, 80.0)
+    assert index.match_district("5", nombres) == (120.0, 80.0)
+    assert index.match_district(5, nombres) == (120.0, 80.0)
+    assert list(index.report()) == ["5"]
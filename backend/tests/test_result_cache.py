@@ -0,0 +1,25 @@
+"""Tamaños estimados de RESULT_CACHE y su límite de memoria."""
+import pickle
+
+from result_cache import ResultCache, estimate_size
+
+
+def test_model_objects_are_sized_by_content(app_module):
+    data = app_module.load_simulation_district('7')
+    entry = app_module.scenario_district('7', data, None)
+    # Del orden de la data real, no del largo de su repr
+    assert estimate_size(entry) >= len(pickle.dumps(entry))
+    index = app_module.PhenomenaIndex(app_module.compute_districts('simulacion'))
+    assert estimate_size(index) > 28 * estimate_size(entry) / 2
+
+
+def test_memory_cap_evicts_district_entries(app_module):
+    entries = [app_module.scenario_district(str(i), app_module.load_simulation_district(str(i)),
+                                            None) for i in range(1, 29)]
+    cap = sum(map(estimate_size, entries[:10]))
+    cache = ResultCache(max_bytes=cap)
+    for i, entry in enumerate(entries):
+        cache.get_or_compute(('distrito', i), 1, lambda entry=entry: entry)
+    info = cache.info()
+    assert info['bytes'] <= cap
+    assert info['entradas'] < 28 and info['evictions'] > 0
@@ -0,0 +1,49 @@
+"""Reconexión a /stream/resultados con Last-Event-ID."""
+from types import MappingProxyType
+
+from results_poller import NationalSnapshot
+from results_stream import ResultBroadcaster
+
+
+def snapshot(version):
+    return NationalSnapshot(version, 0.0, MappingProxyType({}),
+                            MappingProxyType({"nacional": {"resumen": []}}))
+
+
+def published(broadcaster, versions):
+    snaps = [snapshot(v) for v in versions]
+    for prev, curr in zip(snaps, snaps[1:]):
+        broadcaster.publish(prev, curr)
+    return snaps[-1]
+
+
+def events(messages):
+    return [m.decode('utf-8').split('\n')[:2] for m in messages]
+
+
+def test_same_epoch_gets_missed_deltas():
+    stream = ResultBroadcaster()
+    current = published(stream, [1, 2, 3, 4])
+    got = events(stream.catch_up(stream.event_id(2), current))
+    assert got == [[f"id: {stream.event_id(3)}", "event: delta"],
+                   [f"id: {stream.event_id(4)}", "event: delta"]]
+    assert stream.catch_up(stream.event_id(4), current) == []
+
+
+def test_other_epoch_gets_full_snapshot():
+    # Otro proceso (o el mismo tras reiniciar) con versiones que también parten en 1
+    before_restart = ResultBroadcaster()
+    stream = ResultBroadcaster()
+    current = published(stream, [1, 2, 3, 4])
+    for last_id in (before_restart.event_id(2), '2', 'x-2', f"{stream.epoch}-", None):
+        got = events(stream.catch_up(last_id, current))
+        assert got == [[f"id: {stream.event_id(4)}", "event: snapshot"]], last_id
+
+
+def test_stream_sends_epoch_ids(client, app_module):
+    r = client.get('/stream/resultados', buffered=False,
+                   headers={'Last-Event-ID': '1'})
+    first = next(r.response).decode('utf-8')
+    r.close()
+    version = app_module.RESULTS_POLLER.snapshot().version
+    assert first.startswith(f"id: {app_module.RESULT_STREAM.epoch}-{version}\nevent: snapshot\n")
@@ -0,0 +1,55 @@
+"""Alianzas libres (`alianzas=`) desde el query string hasta el hemiciclo."""
+import pytest
+
+from scenarios import parse_alliances
+
+
+KNOWN = set('ABCDEFGHIJKXY')
+
+
+@pytest.mark.parametrize('spec', ['A+B+C,J+K', 'A B C,J K', ' a+b  c , j+k '])
+def test_parse_alliances_separators(spec):
+    overlay = parse_alliances(spec, KNOWN)
+    assert overlay.key == 'A+B+C,J+K'
+    assert overlay.pact_map == {'A': 'SC_A_B_C', 'B': 'SC_A_B_C', 'C': 'SC_A_B_C',
+                                'J': 'SC_J_K', 'K': 'SC_J_K'}
+
+
+@pytest.mark.parametrize('spec', ['J+Z', 'J+K,K+A', 'J', ''])
+def test_parse_alliances_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_alliances(spec, KNOWN)
+
+
+@pytest.mark.parametrize('tipo', ['simulacion', 'real'])
+def test_alliances_through_query_string(client, tipo):
+    # Un '+' literal del query string se decodifica como espacio
+    plain = client.get(f'/nacional?tipo={tipo}&alianzas=J+K')
+    encoded = client.get(f'/nacional?tipo={tipo}&alianzas=J%2BK')
+    assert plain.status_code == encoded.status_code == 200
+    assert plain.get_json() == encoded.get_json()
+    ids = [p['id'] for p in plain.get_json()['resumen']]
+    assert 'SC_J_K' in ids and 'J' not in ids and 'K' not in ids
+
+
+def test_unknown_pact_in_query_string(client):
+    r = client.get('/nacional?alianzas=J+Z')
+    assert r.status_code == 400
+    assert r.get_json()['error'] == 'Pactos desconocidos: Z'
+
+
+def test_alliance_and_named_scenario_do_not_share_cache(client):
+    # La clave de las alianzas "J+K" no debe calzar con un escenario llamado "J+K"
+    alianzas = client.get('/nacional?tipo=simulacion&alianzas=J+K')
+    escenario = client.get('/nacional?tipo=simulacion&escenario=J%2BK')
+    assert alianzas.status_code == 200
+    assert escenario.status_code == 400
+    assert escenario.get_json()['error'] == 'Escenario desconocido: J+K'
+    again = client.get('/nacional?tipo=simulacion&alianzas=J%2BK')
+    assert again.headers['ETag'] == alianzas.headers['ETag']
+
+
+@pytest.mark.parametrize('url', ['/nacional', '/stats/sensibilidad', '/stats/fenomenos'])
+def test_unknown_scenario_is_rejected(client, url):
+    r = client.get(url + '?escenario=no_existe')
+    assert r.status_code == 400